@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tptools.mdf import sample_pathways, solve_pathways
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Max-min driving force of pathways given as TP_central_pathway_MDF.gms include files."
+    )
+    parser.add_argument(
+        "directories", nargs="*", default=[os.path.dirname(os.path.abspath(__file__))],
+        help="directories holding metabolites.txt, reactions.txt, sij.txt, deltaGo.txt, cmin.txt and cmax.txt",
+    )
+    parser.add_argument("--samples", type=int, default=None, help="run this many Monte Carlo samples instead")
+    parser.add_argument("--dg-sd", type=float, default=2.0, help="standard deviation of sampled deltaGo (kJ/mol)")
+    parser.add_argument("--bound-sd", type=float, default=0.0, help="standard deviation of log Cmin/Cmax perturbations")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.samples is None:
+        for directory, result in solve_pathways(args.directories).items():
+            print(f"{directory}: MDF = {result['mdf']:.5f} kJ/mol, DELTAG.txt and CONCENTRATION.txt written")
+    else:
+        results = sample_pathways(args.directories, args.samples, args.dg_sd, args.bound_sd, args.seed)
+        for directory, result in results.items():
+            mdf = result["mdf"][np.isfinite(result["mdf"])]
+            print(f"{directory}: {len(mdf)} of {args.samples} samples feasible, "
+                  f"MDF median {np.median(mdf):.5f}, 5-95% {np.percentile(mdf, 5):.5f} to {np.percentile(mdf, 95):.5f} kJ/mol")
+            print("MDF_SAMPLES.txt and BOTTLENECK.txt written")
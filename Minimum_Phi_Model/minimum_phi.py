@@ -1,114 +1,273 @@
-import cobra
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+
 import gurobipy as gp
 from gurobipy import GRB
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tptools import profiling
+from tptools.cache import file_digest
+from tptools.models import load_arrays
+from tptools.results import save_output
+from tptools.stoich import load_gurobi
+from tptools.store import ChunkStore, load_matrix, save_matrix
+from tptools.workbooks import align_rows, load_sheet
 
-def read_excel_data(xlsx_path):
-    xls = pd.ExcelFile(xlsx_path)
-    kcat_df = pd.read_excel(xls, 'Kcat', index_col=0)
-    mw_df = pd.read_excel(xls, 'MW', index_col=0)
-    return kcat_df, mw_df
+# Per-process state: the persistent Phi LP, the memory-mapped pi matrix and its model column positions
+_phi_model = None
+_pi = None
+_pi_columns = None
 
 
-def update_reaction_bounds(model, reactions_bound_10):
-    """Updates reaction bounds in the model based on specified lists."""
-    for rxn_id in reactions_bound_10:
-        model.reactions.get_by_id(rxn_id).bounds = (0, 10)
-    model.reactions.get_by_id("bio1_biomass").bounds = (0.73338, 0.73338)
+def read_excel_data(xlsx_path):
+    """Returns the Kcat and MW sheets of the simulation workbook, parsed once and then read from the cache."""
+    return load_sheet(xlsx_path, 'Kcat'), load_sheet(xlsx_path, 'MW')
 
-def optimize_phi(model, pi_values):
+
+def build_phi_model(S, reaction_ids):
+    """Builds the minimum-Phi LP once from the stoichiometric matrix; only its objective changes between simulations."""
     m = gp.Model("minimize_phi")
-    fluxes = {rxn.id: m.addVar(lb=0, ub=1000, name=rxn.id) for rxn in model.reactions}
-    m.update()
-    
-    # Add mass balance constraints for each metabolite
-    for met in model.metabolites:
-        m.addConstr(
-            gp.quicksum(fluxes[rxn.id] * rxn.metabolites[met] for rxn in met.reactions if rxn.id in fluxes) == 0, 
-            name=f"mass_balance_{met.id}"
-        )
-    # Add a constraint that forces non-zero flux through an essential reaction
-    m.addConstr(fluxes["bio1_biomass"] >= 0.73338, "demand_biomass")
+
+    # Every flux lies in [0, 1000] regardless of the model's own bounds; the biomass lower bound forces non-zero flux through an essential reaction
+    lb = np.zeros(len(reaction_ids))
+    lb[reaction_ids.index("bio1_biomass")] = 0.73338
+    ub = np.full(len(reaction_ids), 1000.0)
+
+    # Add the flux variables and the mass balance constraints for all metabolites in one matrix call
+    fluxes = load_gurobi(m, S, lb, ub)
+
+    m.ModelSense = GRB.MINIMIZE
+    m.Params.OutputFlag = 0
+    # The objective change keeps the previous basis primal feasible, so primal simplex warm-starts from it
+    m.Params.Method = 0
+    return m, fluxes, reaction_ids
+
+
+def optimize_phi(phi_model, pi_values):
+    """Minimizes Phi for one vector of pi values given in model reaction order (0 for reactions without one).
+
+    Returns Phi and the flux array in the same order, or (inf, None) if the LP has no optimum.
+    """
+    m, fluxes, _ = phi_model
 
     # Define the objective to minimize Φ with a small weight on the sum of fluxes to minimize them as a secondary objective
-    primary_objective = gp.quicksum((fluxes[rxn_id] / 1000) * pi for rxn_id, pi in pi_values.items())
-    secondary_objective = gp.quicksum((fluxes[rxn_id] / 1000) for rxn_id in fluxes) * 0.001  # Adjust the weight as necessary
-    m.setObjective(primary_objective + secondary_objective, GRB.MINIMIZE)
+    # (primary: flux / 1000 * pi, secondary: flux / 1000 * 0.001), written straight into the variables' coefficients
+    secondary_weight = 0.001  # Adjust the weight as necessary
+    with profiling.stage("set_objective"):
+        fluxes.Obj = (pi_values + secondary_weight) / 1000
 
-    m.optimize()
+    profiling.solve(m)
     
     if m.status == GRB.OPTIMAL:
-        return m.objVal, {rxn: fluxes[rxn].x for rxn in fluxes}
+        with profiling.stage("read_solution"):
+            return m.objVal, fluxes.X
     else:
-        return float('inf'), {}
+        return float('inf'), None
 
-# Load the model
-model = cobra.io.read_sbml_model("iTP251_irreversible_model.xml")
+def load_phi_model(model_path):
+    """Builds the Phi LP from the cached array snapshot of the SBML model, without constructing a cobra model.
 
-# Update model bounds
+    The LP only needs the stoichiometry: its flux bounds are fixed in
+    build_phi_model rather than taken from the model.
+    """
+    with profiling.stage("load_arrays"):
+        arrays = load_arrays(model_path)
+    with profiling.stage("build_lp"):
+        return build_phi_model(arrays["S"], arrays["reaction_ids"])
 
-reactions_bound_10 = [
-    "EX_cpd00107_e0_b", "EX_cpd00117_e0_b", "EX_cpd00039_e0_b", "EX_cpd00276_e0_b",
-    "EX_cpd00041_e0_b", "EX_cpd00069_e0_b", "EX_cpd00156_e0_b", "EX_cpd00023_e0_b",
-    "EX_cpd00161_e0_b", "EX_cpd00027_e0_b", "EX_cpd03847_e0_b", "EX_cpd00065_e0_b",
-    "EX_cpd00060_e0_b", "EX_cpd00054_e0_b", "EX_cpd00322_e0_b", "EX_cpd00051_e0_b",
-    "EX_cpd00393_e0_b", "EX_cpd00132_e0_b", "EX_cpd00119_e0_b", "EX_cpd00367_e0_b",
-    "EX_cpd00035_e0_b", "EX_cpd00084_e0_b", "EX_cpd00066_e0_b", "EX_cpd00129_e0_b",
-    "EX_cpd00075_e0_b", "EX_cpd00007_e0_b", "EX_cpd00020_e0_b", "EX_cpd00221_e0_b",
-    "EX_cpd00138_e0_b"
-]
 
-update_reaction_bounds(model, reactions_bound_10)
+def pi_matrix(kcat_sheet, mw_sheet, n_sims, reaction_ids):
+    """Returns pi with pi[s, r] = MW / kcat of reaction_ids[r] in simulation s + 1.
 
+    Both sheets are aligned once onto reaction_ids (the model's reaction order)
+    as simulation x reaction matrices and divided in one step. A reaction
+    missing a Kcat or MW value gets pi = 0 (it drops out of the primary
+    objective); a simulation missing from either sheet is a row of NaN.
+    """
+    sim_strs = [f'Simulation {sim_num}:' for sim_num in range(1, n_sims + 1)]  # Assuming the colon is part of the header based on the error
+    kcat = align_rows(kcat_sheet, reaction_ids, sim_strs).T
+    mw = align_rows(mw_sheet, reaction_ids, sim_strs).T
 
-kcat_df, mw_df = read_excel_data("Kcat_MW_1000simulation_input.xlsx")  # Update this path
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pi = np.where(np.isnan(kcat) | np.isnan(mw), 0.0, mw / kcat)
+    pi[~(np.isin(sim_strs, kcat_sheet['columns']) & np.isin(sim_strs, mw_sheet['columns']))] = np.nan
+    return np.ascontiguousarray(pi)
 
-phi_results = []
-all_fluxes = {}
-min_phi = float('inf')
-optimal_flux_values = None
-optimal_simulation = None
 
-# Perform optimizations for each simulation set
-for sim_num in range(1, 101):
-    sim_str = f'Simulation {sim_num}:'  # Assuming the colon is part of the header based on the error
-    if sim_str in kcat_df.columns and sim_str in mw_df.columns:
-        sim_kcat = kcat_df[sim_str].dropna()
-        sim_mw = mw_df[sim_str].dropna()
-        pi_values = {rxn: sim_mw[rxn] / sim_kcat[rxn] for rxn in sim_kcat.index.intersection(sim_mw.index)}
-        
-        phi, fluxes = optimize_phi(model, pi_values)
+def matrix_digest(columns, array):
+    """Returns the SHA-256 hex digest of a labelled matrix: its column labels, shape, dtype and values."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256("\n".join(columns).encode())
+    digest.update(f"{array.shape} {array.dtype.str}".encode())
+    digest.update(array.tobytes())
+    return digest.hexdigest()
 
-    
-    phi_results.append(phi)
-    all_fluxes[sim_num] = fluxes
-    
-    if phi < min_phi:
-        min_phi = phi
-        optimal_flux_values = fluxes
-        optimal_simulation = sim_num
-# Write the results to an Excel file
-with pd.ExcelWriter('optimization_results.xlsx', engine='openpyxl') as writer:  # Update this path
-    pd.DataFrame({'Simulation': range(1, 101), 'Phi Value': phi_results}).to_excel(writer, sheet_name='Phi Values')
-    if optimal_flux_values:
-        pd.DataFrame({'Reaction ID': list(optimal_flux_values.keys()), 'Flux': list(optimal_flux_values.values())}).to_excel(writer, sheet_name=f'Optimal Fluxes Sim {optimal_simulation}')
-
-print("Optimization completed. Results saved.")
-
-# Now, create a histogram of the Phi values
-plt.figure(figsize=(10, 6))
-plt.hist(phi_results, bins=20, color='skyblue', edgecolor='black')
-plt.title('Distribution of Phi Values Across 100 Simulations')
-plt.xlabel('Phi Value')
-plt.ylabel('Frequency')
-plt.grid(axis='y', alpha=0.75)
-
-# Save the histogram to a file
-plt.savefig('phi_values_histogram.png', dpi=300)
-
-# Optionally, show the histogram in a window (this line can be omitted if running in a non-interactive environment)
-plt.show()
-
-print("Optimization completed. Results and histogram saved.")
\ No newline at end of file
+
+def open_store(store_path, model_path, pi_reactions, pi, n_sims, chunk_size=100):
+    """Opens (or creates) the ChunkStore of a run of simulations 1..n_sims over a pi matrix.
+
+    The store records the SHA-256 digests of the model file and of the pi
+    matrix, and n_sims; reopening it for a run that differs in any of them
+    raises ValueError instead of resuming from the other run's chunks.
+    """
+    if n_sims > len(pi):
+        raise ValueError(f"{n_sims} simulations asked for, but the pi matrix only has {len(pi)}")
+    inputs = {"model_sha256": file_digest(model_path), "pi_sha256": matrix_digest(pi_reactions, pi), "n_sims": n_sims}
+    return ChunkStore(store_path, columns=load_arrays(model_path)["reaction_ids"], chunk_size=chunk_size, inputs=inputs)
+
+
+def _init_worker(model_path, pi_path):
+    """Builds the Phi LP once per worker process; every simulation then only changes its objective."""
+    global _phi_model, _pi, _pi_columns
+    _phi_model = load_phi_model(model_path)
+    pi_reactions, _pi = load_matrix(pi_path)
+
+    # Map the pi matrix columns onto the model's reaction order once
+    model_index = {rxn_id: j for j, rxn_id in enumerate(_phi_model[2])}
+    _pi_columns = (
+        np.array([i for i, rxn_id in enumerate(pi_reactions) if rxn_id in model_index], dtype=int),
+        np.array([model_index[rxn_id] for rxn_id in pi_reactions if rxn_id in model_index], dtype=int),
+    )
+
+
+@profiling.task
+def _solve_chunk(task):
+    """Solves the simulations of one chunk and returns (chunk index, sims, phi values, flux matrix)."""
+    index, sims = task
+    reaction_ids = _phi_model[2]
+    phis = np.full(len(sims), np.inf)
+    fluxes = np.full((len(sims), len(reaction_ids)), np.nan)
+    source, target = _pi_columns
+    pi_values = np.zeros(len(reaction_ids))
+    for i, sim_num in enumerate(sims):
+        sim_pi = _pi[sim_num - 1]
+        if np.isnan(sim_pi).all():
+            continue
+        pi_values[target] = sim_pi[source]
+        phi, sim_fluxes = optimize_phi(_phi_model, pi_values)
+        phis[i] = phi
+        if sim_fluxes is not None:
+            fluxes[i] = sim_fluxes
+    return index, np.asarray(sims), phis, fluxes
+
+
+def run_simulations(store_path, model_path, pi_path, n_sims, processes=1, chunk_size=100):
+    """Solves simulations 1..n_sims and streams each chunk of Phi values and fluxes to a ChunkStore.
+
+    Simulation s takes its objective from row s - 1 of the pi matrix at pi_path,
+    which every worker memory-maps instead of receiving a copy.
+
+    Chunks already in the store are skipped, so an interrupted run resumes
+    from the last completed chunk. The store must have been written for the
+    same model, pi matrix and n_sims (see open_store).
+    """
+    store = open_store(store_path, model_path, *load_matrix(pi_path), n_sims, chunk_size)
+    _init_worker(model_path, pi_path)
+
+    done = set(store.completed_chunks())
+    tasks = [
+        (index, list(range(start, min(start + chunk_size, n_sims + 1))))
+        for index, start in enumerate(range(1, n_sims + 1, chunk_size)) if index not in done
+    ]
+    if done:
+        print(f"Resuming: {len(done)} chunks already in {store_path}, {len(tasks)} to go")
+
+    if processes == 1:
+        results = map(_solve_chunk, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(model_path, pi_path))
+        results = pool.imap_unordered(_solve_chunk, tasks)
+    try:
+        for index, sims, phis, fluxes in results:
+            with profiling.stage("write_chunk"):
+                store.write_chunk(index, simulation=sims, phi=phis, fluxes=fluxes)
+            print(f"Chunk {index} (simulations {sims[0]}-{sims[-1]}) saved")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo minimum-Phi sampling over Kcat/MW draws.")
+    parser.add_argument("--model", default="iTP251_irreversible_model.xml")
+    parser.add_argument("--input", default="Kcat_MW_1000simulation_input.xlsx")  # Update this path
+    parser.add_argument("--pi", default=None,
+                        help="pi matrix .npy written by Monte_Carlo/MCS_Kcat_MW1.py --pairs, used instead of --input")
+    parser.add_argument("--n-sims", type=int, default=None, help="number of simulations (default: all in the workbook)")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=100, help="simulations per stored chunk")
+    parser.add_argument("--store", default="phi_samples", help="directory the per-chunk results are streamed to")
+    parser.add_argument("--excel", action="store_true", help="also export the results to optimization_results.xlsx")
+    parser.add_argument("--profile", default=None,
+                        help="log per-stage timings and LP counters to this file (see python -m tptools.profiling)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+
+    os.makedirs(args.store, exist_ok=True)
+    if args.pi:
+        # Sampled pi matrices are memory-mapped by the workers as they are
+        pi_path = args.pi
+        n_sims = args.n_sims or len(load_matrix(pi_path)[1])
+    else:
+        with profiling.stage("read_workbook"):
+            kcat_sheet, mw_sheet = read_excel_data(args.input)
+        n_sims = args.n_sims or len(kcat_sheet['columns'])
+        pi_path = os.path.join(args.store, "pi.npy")
+        with profiling.stage("pi_matrix"):
+            reaction_ids = load_arrays(args.model)["reaction_ids"]
+            pi = pi_matrix(kcat_sheet, mw_sheet, n_sims, reaction_ids)
+        # Checked before pi.npy is written, so a store of another run keeps its own pi matrix
+        open_store(args.store, args.model, reaction_ids, pi, n_sims, args.chunk_size)
+        save_matrix(pi_path, reaction_ids, pi)
+
+    # Perform optimizations for each simulation set
+    with profiling.stage("run_simulations"):
+        store = run_simulations(args.store, args.model, pi_path, n_sims, args.processes, args.chunk_size)
+
+    simulations = store.read("simulation")
+    phi_results = store.read("phi")
+
+    # Look up the fluxes of the best simulation in its chunk instead of keeping every flux vector in memory
+    best = int(np.argmin(phi_results))
+    optimal_simulation = int(simulations[best])
+    optimal_flux_values = None
+    if np.isfinite(phi_results[best]):
+        chunk = (optimal_simulation - 1) // store.chunk_size
+        offset = (optimal_simulation - 1) % store.chunk_size
+        optimal_flux_values = store.load_chunk(chunk, "fluxes")[offset]
+
+    # Save the results (optimization_results.arrow), and export them to an Excel file if asked
+    tables = {'Phi Values': pd.DataFrame({'Simulation': simulations, 'Phi Value': phi_results})}
+    if optimal_flux_values is not None:
+        tables[f'Optimal Fluxes Sim {optimal_simulation}'] = pd.DataFrame({'Reaction ID': store.columns, 'Flux': optimal_flux_values})
+    with profiling.stage("write_results"):
+        save_output('optimization_results.xlsx', tables, metadata={'model': args.model, 'pi': pi_path}, excel=args.excel)  # Update this path
+
+    print("Optimization completed. Results saved.")
+
+    # Now, create a histogram of the Phi values
+    plt.figure(figsize=(10, 6))
+    plt.hist(phi_results[np.isfinite(phi_results)], bins=20, color='skyblue', edgecolor='black')
+    plt.title(f'Distribution of Phi Values Across {len(phi_results)} Simulations')
+    plt.xlabel('Phi Value')
+    plt.ylabel('Frequency')
+    plt.grid(axis='y', alpha=0.75)
+
+    # Save the histogram to a file
+    with profiling.stage("plot"):
+        plt.savefig('phi_values_histogram.png', dpi=300)
+
+    # Optionally, show the histogram in a window (this line can be omitted if running in a non-interactive environment)
+    plt.show()
+
+    print("Optimization completed. Results and histogram saved.")
\ No newline at end of file
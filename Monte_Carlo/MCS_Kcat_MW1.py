@@ -1,63 +1,130 @@
+import argparse
+import os
+import sys
+
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 from matplotlib import font_manager
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tptools.kde import batched_kde, kde_grid
+from tptools.store import save_matrix
+from tptools.workbooks import load_sheet
+
+
+def read_kcat(path, max_kcat=100):
+    """Reads one Kcat (1/s) per line, keeping the values at or below max_kcat."""
+    kcat_data = np.loadtxt(path, ndmin=1)
+    return kcat_data[kcat_data <= max_kcat]
+
+
+def resample(data, n_simulations, n_samples, seed=None):
+    """Draws every bootstrap sample at once as an (n_simulations x n_samples) array."""
+    rng = np.random.default_rng(seed)
+    return rng.choice(data, size=(n_simulations, n_samples), replace=True)
+
+
+def read_pairs(path):
+    """Reads the (reaction ids, Kcat, MW) columns of a kcat_mw.xlsx pairs sheet, through the workbook cache."""
+    pairs = load_sheet(path, "Sheet2")
+    kcat, mw = pairs["values"][:, [pairs["columns"].index("Kcat"), pairs["columns"].index("MW")]].T
+    return pairs["index"], kcat, mw
+
+
+def resample_pairs(kcat, mw, n_simulations, n_reactions, seed=None):
+    """Draws one (Kcat, MW) pair per reaction and simulation, keeping each Kcat with its own MW.
+
+    Returns (kcat, mw), both (n_simulations x n_reactions) arrays indexed by
+    the same drawn pair indices.
+    """
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, len(kcat), size=(n_simulations, n_reactions))
+    return kcat[index], mw[index]
 
-# Read data from kcat.txt
-with open('Kcat_TP.txt', 'r') as file:
-    kcat_data = np.array([float(line.strip()) for line in file.readlines() if float(line.strip()) <= 100])
 
-# Create a DataFrame for the data
-df_kcat = pd.DataFrame({'Kcat': kcat_data})
+def _density_figure(xlabel, ylabel):
+    """Returns a headless (Agg) figure and axes formatted like the original seaborn plots."""
+    fig = Figure(figsize=(16, 10))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_xlabel(xlabel, fontsize=32, fontweight='bold')
+    ax.set_ylabel(ylabel, fontsize=32, fontweight='bold')
+    ax.tick_params(labelsize=22)
+    return fig, ax
+
 
 # Plotting function with formatting
-def plot_density(data, variable, color, title, xlabel, ylabel):
-    plt.figure(figsize=(16, 10))
-    sns.set_style("white")
-    sns.kdeplot(data=data, x=variable, color=color, fill=True, linewidth=2)
-    plt.xlabel(xlabel, fontsize=32, fontweight='bold')
-    plt.ylabel(ylabel, fontsize=32, fontweight='bold')
-    plt.xticks(fontsize=22)
-    plt.yticks(fontsize=22)
-    plt.title(title)
-    plt.tight_layout()
-    plt.show()
-
-# Plot original density plot for Kcat
-plot_density(df_kcat, 'Kcat', 'skyblue', '', 'Kcat (1/s)', 'Density')
-
-# Perform Monte Carlo simulation for Kcat
-num_samples_kcat = 80
-num_simulations_kcat = 100
-monte_carlo_results_kcat = []
-
-for _ in range(num_simulations_kcat):
-    kcat_samples = np.random.choice(kcat_data, num_samples_kcat, replace=True)
-    monte_carlo_results_kcat.append(kcat_samples)
-
-# Write Kcat Monte Carlo simulation results to a text file
-with open('Kcat_MC_TP.txt', 'w') as file:
-    for i, result in enumerate(monte_carlo_results_kcat):
-        file.write(f"Simulation {i+1}:\n")
-        for kcat in result:
-            file.write(f"{kcat}\n")
-        file.write("\n")
-
-# Define the font properties
-legend_font_props = font_manager.FontProperties(style='normal', size=22, weight='bold')
-
-# Plot the original and Monte Carlo simulation results for Kcat
-plt.figure(figsize=(16, 10))
-sns.set_style("white")
-sns.kdeplot(data=kcat_data, color='blue', fill=True, linewidth=2, label='Original Kcat Distribution')
-for i in range(num_simulations_kcat):
-    sns.kdeplot(data=monte_carlo_results_kcat[i], color='orange', alpha=0.3, linewidth=1)
-plt.xlabel('Kcat (1/s)', fontsize=32, fontweight='bold')
-plt.ylabel('Density', fontsize=32, fontweight='bold')
-plt.xticks(fontsize=22)
-plt.yticks(fontsize=22)
-plt.legend(['Original Kcat Distribution', 'Monte Carlo Simulation'], loc='upper right', prop=legend_font_props)
-plt.tight_layout()
-plt.savefig('Kcat_distribution_TP.png')
-plt.show()
+def plot_density(data, color, xlabel, ylabel, output):
+    """Saves the filled KDE of one sample to output."""
+    grid = kde_grid(data)
+    density = batched_kde(data, grid)[0]
+    fig, ax = _density_figure(xlabel, ylabel)
+    ax.fill_between(grid, density, color=color, alpha=0.25)
+    ax.plot(grid, density, color=color, linewidth=2)
+    ax.set_ylim(bottom=0)
+    fig.tight_layout()
+    fig.savefig(output)
+
+
+def plot_simulations(kcat_data, monte_carlo_results_kcat, output, n_points=512):
+    """Saves the original Kcat density with every simulation's density overlaid.
+
+    All simulation curves are evaluated together on one grid (see
+    tptools.kde.batched_kde) and drawn as a single LineCollection.
+    """
+    grid = kde_grid([kcat_data, monte_carlo_results_kcat], n_points)
+    original = batched_kde(kcat_data, grid)[0]
+    densities = batched_kde(monte_carlo_results_kcat, grid)
+
+    # Define the font properties
+    legend_font_props = font_manager.FontProperties(style='normal', size=22, weight='bold')
+
+    # Plot the original and Monte Carlo simulation results for Kcat
+    fig, ax = _density_figure('Kcat (1/s)', 'Density')
+    ax.fill_between(grid, original, color='blue', alpha=0.25)
+    ax.plot(grid, original, color='blue', linewidth=2, label='Original Kcat Distribution', zorder=3)
+    curves = np.stack([np.broadcast_to(grid, densities.shape), densities], axis=-1)
+    ax.add_collection(LineCollection(curves, colors='orange', alpha=0.3, linewidths=1, label='Monte Carlo Simulation'))
+    ax.set_xlim(grid[0], grid[-1])
+    ax.set_ylim(0, max(original.max(), densities.max()) * 1.05)
+    ax.legend(loc='upper right', prop=legend_font_props)
+    fig.tight_layout()
+    fig.savefig(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo resampling of Kcat values or Kcat/MW pairs.")
+    parser.add_argument("--kcat", default="Kcat_TP.txt", help="one Kcat (1/s) per line")
+    parser.add_argument("--pairs", default=None,
+                        help="kcat_mw.xlsx whose Sheet2 pairs are sampled jointly into a pi = MW/Kcat matrix")
+    parser.add_argument("--n-simulations", type=int, default=100)
+    parser.add_argument("--n-samples", type=int, default=80, help="Kcat values drawn per simulation")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generator, for reproducible draws")
+    parser.add_argument("--output", default=None,
+                        help="output .npy (default: Kcat_MC_TP.npy, or pi_MC.npy with --pairs)")
+    parser.add_argument("--plot", action="store_true",
+                        help="save the original Kcat density (Kcat_density_TP.png) and the overlay of every "
+                             "simulation's density (Kcat_distribution_TP.png)")
+    args = parser.parse_args()
+
+    if args.pairs:
+        # Every reaction of the pairs sheet gets a drawn pair in every simulation
+        reaction_ids, kcat, mw = read_pairs(args.pairs)
+        kcat_samples, mw_samples = resample_pairs(kcat, mw, args.n_simulations, len(reaction_ids), args.seed)
+        output = args.output or "pi_MC.npy"
+        save_matrix(output, reaction_ids, mw_samples / kcat_samples)
+        print(f"{args.n_simulations} x {len(reaction_ids)} pi matrix written to {output}; "
+              f"run Minimum_Phi_Model/minimum_phi.py --pi {output}")
+    else:
+        kcat_data = read_kcat(args.kcat)
+        monte_carlo_results_kcat = resample(kcat_data, args.n_simulations, args.n_samples, args.seed)
+        output = args.output or "Kcat_MC_TP.npy"
+        np.save(output, monte_carlo_results_kcat)
+        print(f"{args.n_simulations} x {args.n_samples} Kcat samples written to {output}")
+
+        if args.plot:
+            # Plot original density plot for Kcat
+            plot_density(kcat_data, 'skyblue', 'Kcat (1/s)', 'Density', 'Kcat_density_TP.png')
+            plot_simulations(kcat_data, monte_carlo_results_kcat, 'Kcat_distribution_TP.png')
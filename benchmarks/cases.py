@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import time
+
+import cobra
+import numpy as np
+import optlang.interface
+from cobra.flux_analysis import pfba
+from cobra.io import model_from_dict, model_to_dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Minimum_Phi_Model"))
+
+from essential_genes import screen_genes  # noqa: E402
+from essential_reactions import biomass_reductions  # noqa: E402
+from tptools.models import load_arrays, load_model  # noqa: E402
+from tptools.scenarios import ScenarioRunner, load_scenarios  # noqa: E402
+
+# Bundled models every case runs against, and the synthetic copies are built from
+MODELS = {
+    "iTP251": os.path.join(ROOT, "Minimum_Phi_Model", "iTP251_irreversible_model.xml"),
+    "iTP252": os.path.join(ROOT, "pcGEM_Glucose", "iTP252_irreversible_model.xml"),
+}
+
+# pcGEM analyses timed by the pfba case
+PFBA_ANALYSES = ("min_protein_cost", "max_biomass")
+
+
+class SolverMeter:
+    """Counts the LPs solved through optlang and the time spent inside their optimize() calls.
+
+    gurobipy models built directly (the minimum-Phi LP) are not seen by
+    optlang; their cases call add() with the solver's own runtime instead.
+    """
+
+    def __init__(self):
+        self.lps = 0
+        self.seconds = 0.0
+        self._optimize = None
+
+    def add(self, seconds):
+        self.lps += 1
+        self.seconds += seconds
+
+    def __enter__(self):
+        self._optimize = optimize = optlang.interface.Model.optimize
+        meter = self
+
+        def timed_optimize(model):
+            start = time.perf_counter()
+            try:
+                return optimize(model)
+            finally:
+                meter.add(time.perf_counter() - start)
+
+        optlang.interface.Model.optimize = timed_optimize
+        return self
+
+    def __exit__(self, *exc_info):
+        optlang.interface.Model.optimize = self._optimize
+
+
+def enlarge_model(model, copies):
+    """Returns a model made of `copies` disjoint copies of model, for measuring how workflows scale.
+
+    The first copy keeps the original ids, so workflows that look up
+    reactions such as bio1_biomass by id still find them; the others get a
+    "_copy<k>" suffix on every reaction, metabolite and gene id. Each copy
+    keeps its objective coefficients, so the objective is the sum over copies.
+    """
+    original = model_to_dict(model)
+    doc = {key: value for key, value in original.items() if key not in ("reactions", "metabolites", "genes")}
+    doc.update(reactions=[], metabolites=[], genes=[])
+    for k in range(copies):
+        suffix = f"_copy{k}" if k else ""
+
+        def rename(identifier):
+            return identifier + suffix
+
+        for metabolite in original["metabolites"]:
+            doc["metabolites"].append({**metabolite, "id": rename(metabolite["id"])})
+        for gene in original["genes"]:
+            doc["genes"].append({**gene, "id": rename(gene["id"])})
+        for reaction in original["reactions"]:
+            rule = re.sub(
+                r"[^\s()]+", lambda token: token[0] if token[0] in ("and", "or") else rename(token[0]),
+                reaction.get("gene_reaction_rule", ""),
+            )
+            doc["reactions"].append({
+                **reaction,
+                "id": rename(reaction["id"]),
+                "metabolites": {rename(met): coeff for met, coeff in reaction["metabolites"].items()},
+                "gene_reaction_rule": rule,
+            })
+    return model_from_dict(doc)
+
+
+def read_sbml(model_path, meter):
+    """Parses the SBML file with cobra, bypassing the tptools model cache."""
+    cobra.io.read_sbml_model(model_path)
+
+
+def load_cached(model_path, meter):
+    """Loads the model through tptools.models.load_model from a warm cache."""
+    load_model(model_path)
+
+
+def essential_genes(model_path, meter):
+    """Single gene deletion screen of essential_genes.py, serially."""
+    screen_genes(model_path)
+
+
+def essential_reactions(model_path, meter):
+    """Single reaction deletion screen of essential_reactions.py, skipping idle reactions."""
+    biomass_reductions(load_model(model_path))
+
+
+def optimize_phi(model_path, meter, n_simulations=20, seed=0):
+    """Builds the minimum-Phi LP and solves it for n_simulations random pi vectors."""
+    import minimum_phi
+
+    phi_model = minimum_phi.load_phi_model(model_path)
+    rng = np.random.default_rng(seed)
+    for _ in range(n_simulations):
+        minimum_phi.optimize_phi(phi_model, rng.lognormal(size=len(phi_model[2])))
+        meter.add(phi_model[0].Runtime)
+
+
+def pcgem_pfba(model_path, meter):
+    """Runs the pFBA conditions of every bundled pcGEM scenario file, on the models they name."""
+    runner = ScenarioRunner()
+    for path in sorted(glob_scenarios()):
+        for condition in load_scenarios(path):
+            if condition["analysis"] not in PFBA_ANALYSES:
+                continue
+            try:
+                runner.run(condition)
+            except (KeyError, FileNotFoundError):
+                continue
+
+
+def synthetic_pfba(model_path, meter):
+    """Plain pFBA of the model's own objective, which scales with the synthetic copies."""
+    pfba(load_model(model_path))
+
+
+def glob_scenarios():
+    return [
+        os.path.join(ROOT, name, "scenarios.json")
+        for name in os.listdir(ROOT)
+        if name.startswith("pcGEM_") and os.path.exists(os.path.join(ROOT, name, "scenarios.json"))
+    ]
+
+
+# name: (case, whether it runs on every model and size; the others run once on the scenario files)
+CASES = {
+    "read_sbml": (read_sbml, True),
+    "load_cached": (load_cached, True),
+    "essential_genes": (essential_genes, True),
+    "essential_reactions": (essential_reactions, True),
+    "optimize_phi": (optimize_phi, True),
+    "pfba": (synthetic_pfba, True),
+    "pcgem_pfba": (pcgem_pfba, False),
+}
@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cobra
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import cases  # noqa: E402
+from tptools.cache import cache_dir  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# A case is reported as a regression when it is this much slower than its baseline
+DEFAULT_THRESHOLD = 1.25
+
+
+def synthetic_model(name, copies, directory):
+    """Writes (once) and returns the SBML path of a bundled model enlarged to `copies` disjoint copies."""
+    if copies == 1:
+        return cases.MODELS[name]
+    path = os.path.join(directory, f"{name}_x{copies}.xml")
+    if not os.path.exists(path):
+        model = cobra.io.read_sbml_model(cases.MODELS[name])
+        cobra.io.write_sbml_model(cases.enlarge_model(model, copies), path)
+    return path
+
+
+def peak_rss_mb():
+    """Returns the peak resident memory of this process in MB.
+
+    Read from VmHWM in /proc/self/status, which the kernel resets when the
+    worker execs. ru_maxrss is not: it carries the high-water mark of the
+    benchmark parent, which has already loaded the models, into every worker.
+    It is only used where /proc is missing (it is KB on Linux, bytes on macOS).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def run_case(case, model_path, solver):
+    """Runs one case in this process and returns its measurements; used by the --worker subprocess."""
+    cobra.Configuration().solver = solver
+    function, _ = cases.CASES[case]
+    with cases.SolverMeter() as meter:
+        start = time.perf_counter()
+        function(model_path, meter)
+        wall = time.perf_counter() - start
+    return {
+        "wall_s": wall,
+        "solver_s": meter.seconds,
+        "lps": meter.lps,
+        "lps_per_s": meter.lps / wall if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(case, model_path, solver, timeout=None):
+    """Runs one case in a fresh interpreter, so its peak memory and imports are its own.
+
+    Returns its measurements, or {"error": message} if it failed.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--worker", case, model_path, "--solver", solver]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout} s"}
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def default_solver():
+    """Returns the name of cobra's configured solver, e.g. "gurobi" for optlang.gurobi_interface."""
+    return cobra.Configuration().solver.__name__.rsplit(".", 1)[-1].replace("_interface", "")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cases.ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(record):
+    return f"{record['case']}/{record['model']}/x{record['copies']}/{record['solver']}"
+
+
+def compare(records, baseline, threshold=DEFAULT_THRESHOLD):
+    """Prints every record against its baseline and returns the keys whose wall time regressed."""
+    regressions = []
+    print(f"{'case':<48} {'wall s':>9} {'solver s':>9} {'LPs':>6} {'LPs/s':>9} {'RSS MB':>8} {'vs base':>8}")
+    for record in records:
+        key = case_key(record)
+        if "error" in record:
+            print(f"{key:<48} failed: {record['error']}")
+            continue
+        ratio = ""
+        reference = baseline.get(key)
+        if reference:
+            change = record["wall_s"] / reference["wall_s"]
+            ratio = f"{change:.2f}x"
+            if change > threshold:
+                regressions.append(key)
+                ratio += " !"
+        lps_per_s = f"{record['lps_per_s']:.1f}" if record["lps_per_s"] is not None else "-"
+        print(f"{key:<48} {record['wall_s']:>9.3f} {record['solver_s']:>9.3f} {record['lps']:>6} {lps_per_s:>9} "
+              f"{record['peak_rss_mb']:>8.1f} {ratio:>8}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the repository's workflows on the bundled and enlarged models.")
+    parser.add_argument("--cases", nargs="+", default=list(cases.CASES), choices=list(cases.CASES))
+    parser.add_argument("--models", nargs="+", default=list(cases.MODELS), choices=list(cases.MODELS))
+    parser.add_argument("--copies", nargs="+", type=int, default=[1],
+                        help="model sizes to run, in disjoint copies of the bundled model (e.g. 1 2 4)")
+    parser.add_argument("--solver", default=default_solver(),
+                        help="optlang solver for the cobra-based cases (size-limited Gurobi licenses need glpk "
+                             "or highs for enlarged models)")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds before a case is abandoned")
+    parser.add_argument("--history", default=os.path.join(HERE, "history.jsonl"),
+                        help="JSON Lines file every measurement is appended to")
+    parser.add_argument("--baseline", default=os.path.join(HERE, "baseline.json"),
+                        help="measurements each run is compared with")
+    parser.add_argument("--save-baseline", action="store_true", help="make this run the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="wall time ratio to the baseline reported as a regression")
+    parser.add_argument("--worker", nargs=2, metavar=("CASE", "MODEL_PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(*args.worker, args.solver)))
+        sys.exit()
+
+    # Synthetic models are written once, and every model's cache is warmed before anything is timed
+    cobra.Configuration().solver = args.solver
+    synthetic_dir = os.path.join(cache_dir(), "benchmarks")
+    os.makedirs(synthetic_dir, exist_ok=True)
+    jobs = []
+    for name in args.models:
+        for copies in args.copies:
+            model_path = synthetic_model(name, copies, synthetic_dir)
+            cases.load_model(model_path)
+            cases.load_arrays(model_path)
+            jobs += [(case, name, copies, model_path) for case in args.cases if cases.CASES[case][1]]
+    # Cases tied to the scenario files rather than to a model run once
+    jobs += [(case, "pcGEM", 1, "") for case in args.cases if not cases.CASES[case][1]]
+
+    commit = git_commit()
+    records = []
+    for case, name, copies, model_path in jobs:
+        print(f"Running {case} on {name} x{copies}", flush=True)
+        record = {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "case": case,
+            "model": name,
+            "copies": copies,
+            "solver": args.solver,
+            **measure(case, model_path, args.solver, args.timeout),
+        }
+        records.append(record)
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(records, baseline, args.threshold)
+
+    if args.save_baseline:
+        baseline.update({case_key(record): record for record in records if "error" not in record})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than {args.threshold:.2f}x their baseline: {', '.join(regressions)}")
+        sys.exit(1)
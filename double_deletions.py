@@ -0,0 +1,143 @@
+import argparse
+import itertools
+
+import pandas as pd
+from cobra.flux_analysis import flux_variability_analysis
+
+from knockouts import (
+    ESSENTIAL_THRESHOLD, flux_vector, group_by_knockout, init_worker, knockout_map, solve_knockouts,
+)
+from tptools import profiling
+from tptools.results import save_output
+from tptools.solver import FLUX_TOLERANCE
+
+
+def zero_flux_reactions(model, processes=1):
+    """Returns the ids of reactions that carry zero flux in every optimal solution."""
+    fva = flux_variability_analysis(model, fraction_of_optimum=1.0, processes=processes)
+    idle = (fva["minimum"].abs() <= FLUX_TOLERANCE) & (fva["maximum"].abs() <= FLUX_TOLERANCE)
+    return set(fva.index[idle])
+
+
+def _single_solutions(model, ko_map, wt_growth, wt_fluxes, model_path, objective, processes):
+    """Returns a {reaction set: (growth, fluxes)} map for the single knockouts in ko_map.
+
+    Sets whose reactions all carry zero flux in the wild-type optimum keep the
+    wild-type solution without a solve.
+    """
+    index = {rxn.id: i for i, rxn in enumerate(model.reactions)}
+    solutions = {}
+    to_solve = []
+    for reaction_ids in set(ko_map.values()):
+        if all(abs(wt_fluxes[index[rxn_id]]) <= FLUX_TOLERANCE for rxn_id in reaction_ids):
+            solutions[reaction_ids] = (wt_growth, wt_fluxes)
+        else:
+            to_solve.append(reaction_ids)
+    solutions.update(solve_knockouts(to_solve, model_path, objective, processes, fluxes=True))
+    return solutions
+
+
+def _idle_in(solution, reaction_ids, index):
+    """Returns True if a single-knockout solution carries no flux through any of reaction_ids."""
+    growth, fluxes = solution
+    return fluxes is not None and all(abs(fluxes[index[rxn_id]]) <= FLUX_TOLERANCE for rxn_id in reaction_ids)
+
+
+def double_deletions(model_path, kind="reaction", objective="bio1_biomass", processes=1,
+                     threshold=ESSENTIAL_THRESHOLD):
+    """Returns the wild-type growth, a {member: growth} map of single knockouts, a
+    {(member 1, member 2): growth} map of double knockouts and the number of
+    LPs solved for the pairs.
+
+    kind is "reaction" or "gene". Pairs are only solved when the single knockouts
+    cannot settle them:
+
+    - pairs with an essential member are skipped (already lethal),
+    - pairs whose disabled reactions all carry zero flux in every optimal
+      solution keep the wild-type growth,
+    - pairs where one single-knockout optimum already carries no flux through
+      the other member's reactions keep that single-knockout growth,
+    - the remaining pairs are grouped by disabled reaction set and each set is
+      solved once across the worker processes.
+    """
+    model = init_worker(model_path, objective)
+    index = {rxn.id: i for i, rxn in enumerate(model.reactions)}
+
+    wt_growth = model.slim_optimize(error_value=0.0)
+    wt_fluxes = flux_vector(model)
+    idle = zero_flux_reactions(model, processes)
+
+    if kind == "gene":
+        genes = model.genes
+        ko_map = knockout_map(model)
+    else:
+        ko_map = {rxn.id: frozenset([rxn.id]) for rxn in model.reactions}
+
+    singles = _single_solutions(model, ko_map, wt_growth, wt_fluxes, model_path, objective, processes)
+    single_growth = {member: singles[reaction_ids][0] for member, reaction_ids in ko_map.items()}
+    viable = [member for member, growth in single_growth.items() if wt_growth > 0 and growth / wt_growth > threshold]
+
+    pair_growth = {}
+    pair_sets = {}
+    for a, b in itertools.combinations(viable, 2):
+        if kind == "gene":
+            candidates = genes.get_by_id(a).reactions | genes.get_by_id(b).reactions
+            disabled = frozenset(rxn.id for rxn in candidates if not rxn.gpr.eval(knockouts={a, b}))
+        else:
+            disabled = ko_map[a] | ko_map[b]
+
+        if disabled <= idle:
+            pair_growth[a, b] = wt_growth
+        elif _idle_in(singles[ko_map[a]], disabled - ko_map[a], index):
+            pair_growth[a, b] = single_growth[a]
+        elif _idle_in(singles[ko_map[b]], disabled - ko_map[b], index):
+            pair_growth[a, b] = single_growth[b]
+        else:
+            pair_sets[a, b] = disabled
+
+    groups = group_by_knockout(pair_sets)
+    set_growth = solve_knockouts(list(groups), model_path, objective, processes)
+    for reaction_ids, pairs in groups.items():
+        for pair in pairs:
+            pair_growth[pair] = set_growth[reaction_ids]
+
+    return wt_growth, single_growth, pair_growth, len(groups)
+
+
+def synthetic_lethal_pairs(wt_growth, pair_growth, threshold=ESSENTIAL_THRESHOLD):
+    """Returns a DataFrame of the pairs whose double knockout reduces growth to the threshold or below."""
+    rows = [
+        (a, b, growth, growth / wt_growth)
+        for (a, b), growth in pair_growth.items() if growth / wt_growth <= threshold
+    ]
+    return pd.DataFrame(rows, columns=["Member 1", "Member 2", "Growth", "Growth Ratio"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pairwise gene or reaction deletion screen.")
+    parser.add_argument("--model", default="iTP251.xml", help="SBML model to screen")
+    parser.add_argument("--kind", choices=["reaction", "gene"], default="reaction")
+    parser.add_argument("--objective", default="bio1_biomass", help="reaction to maximize")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--output", default=None,
+                        help="output name; the result is saved as .arrow, and as this .xlsx with --excel")
+    parser.add_argument("--excel", action="store_true", help="also export the result to --output")
+    parser.add_argument("--profile", default=None,
+                        help="log per-stage timings and LP counters to this file (see python -m tptools.profiling)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+
+    with profiling.stage("screen"):
+        wt_growth, single_growth, pair_growth, lps = double_deletions(
+            args.model, args.kind, args.objective, args.processes
+        )
+    print(f"{len(pair_growth)} pairs screened with {lps} LPs")
+
+    output = args.output or f"synthetic_lethal_{args.kind}s.xlsx"
+    with profiling.stage("write_output"):
+        written = save_output(
+            output, {"Synthetic Lethal Pairs": synthetic_lethal_pairs(wt_growth, pair_growth)},
+            metadata={"model": args.model, "kind": args.kind, "objective": args.objective}, excel=args.excel,
+        )
+    print(f"Synthetic lethal pairs written to {', '.join(written)}")
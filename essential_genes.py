@@ -1,29 +1,54 @@
-import cobra
-import numpy as np
-
-# Load the metabolic model from the current directory
-model = cobra.io.read_sbml_model("iTP251.xml")
-
-# Define the objective function to maximize growth rate
-model.objective = model.reactions.get_by_id("bio1_biomass")
-
-# Perform single gene deletions and simulate growth
-essential_genes = []
-for gene in model.genes:
-    # Create a copy of the model with the gene deleted
-    model_copy = model.copy()
-    model_copy.genes.get_by_id(gene.id).knock_out()
-
-    # Simulate growth and check if it is reduced by 90% or more
-    wt_sol = model.optimize()
-    del_sol = model_copy.optimize()
-    if del_sol.objective_value / wt_sol.objective_value <= 0.10:
-        essential_genes.append(gene.id)
-
-# Write the list of essential genes to a text file
-with open("essential_genes.txt", "w") as f:
-    for gene in essential_genes:
-        f.write(gene + "\n")
-
-# Print a message indicating where the output was written
-print("Essential genes written to essential_genes.txt.")
\ No newline at end of file
+import argparse
+
+from knockouts import ESSENTIAL_THRESHOLD, group_by_knockout, init_worker, knockout_map, solve_knockouts
+from tptools import profiling
+
+
+def screen_genes(model_path, objective="bio1_biomass", processes=1):
+    """Returns the wild-type growth and a {gene: growth} map of single gene knockouts.
+
+    Genes that disable the same set of reactions share one LP, and genes that
+    disable no reaction take the wild-type growth without a solve.
+    """
+    model = init_worker(model_path, objective)
+
+    # The wild type is solved only once for the whole screen
+    wt_growth = model.slim_optimize(error_value=0.0)
+    ko_map = knockout_map(model)
+    groups = group_by_knockout(ko_map)
+
+    set_growth = solve_knockouts([s for s in groups if s], model_path, objective, processes)
+    set_growth[frozenset()] = wt_growth
+
+    return wt_growth, {gene_id: set_growth[reaction_ids] for gene_id, reaction_ids in ko_map.items()}
+
+
+def essential_genes(wt_growth, knockout_growth, threshold=ESSENTIAL_THRESHOLD):
+    """Returns the genes whose knockout reduces growth to the threshold fraction or below."""
+    if wt_growth <= 0:
+        return []
+    return [gene_id for gene_id, growth in knockout_growth.items() if growth / wt_growth <= threshold]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single gene deletion screen.")
+    parser.add_argument("--model", default="iTP251.xml", help="SBML model to screen")
+    parser.add_argument("--objective", default="bio1_biomass", help="reaction to maximize")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--output", default="essential_genes.txt")
+    parser.add_argument("--profile", default=None,
+                        help="log per-stage timings and LP counters to this file (see python -m tptools.profiling)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+
+    with profiling.stage("screen"):
+        wt_growth, knockout_growth = screen_genes(args.model, args.objective, args.processes)
+
+    # Write the list of essential genes to a text file
+    with open(args.output, "w") as f:
+        for gene in essential_genes(wt_growth, knockout_growth):
+            f.write(gene + "\n")
+
+    # Print a message indicating where the output was written
+    print(f"Essential genes written to {args.output}.")
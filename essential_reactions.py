@@ -1,41 +1,67 @@
-import cobra
+import argparse
+
 import pandas as pd
 
-# Load the model
-model = cobra.io.read_sbml_model('iTP251.xml')
-
-# Initialize lists to store results
-reactions_list = []
-biomass_reduction_list = []
-pathway_list = []
-
-# Get the original biomass reaction objective value
-original_solution = model.optimize()
-original_biomass = original_solution.objective_value
-
-# Iterate through each reaction in the model
-for reaction in model.reactions:
-    # Temporarily knock out the reaction
-    with model:
-        reaction.knock_out()
-        solution = model.optimize()
-        
-        # Calculate biomass reduction
-        biomass_reduction = (original_biomass - solution.objective_value) / original_biomass * 100
-        
-        # Append data to lists
-        reactions_list.append(reaction.id)
-        biomass_reduction_list.append(biomass_reduction)
-        pathway_list.append(reaction.name)  # Use the reaction name as the pathway
-
-# Create a DataFrame to store the results
-results_df = pd.DataFrame({
-    'Reaction': reactions_list,
-    'Biomass Reduction (%)': biomass_reduction_list,
-    'Enzyme': pathway_list
-})
-
-# Save the DataFrame to an Excel file
-results_df.to_excel('essential_reactions2.xlsx', index=False)
-
-print("Analysis complete. All reactions saved to reactions_analysis_with_names.xlsx")
\ No newline at end of file
+from tptools import profiling
+from tptools.models import load_model
+from tptools.results import save_output
+from tptools.solver import FLUX_TOLERANCE, flux_vector
+
+
+def biomass_reductions(model, skip_idle=True):
+    """Returns the biomass reduction (%) of every single reaction knockout, in model order.
+
+    With skip_idle, reactions that carry no flux in the wild-type optimum are
+    reported as 0% without a solve, since removing them leaves that optimum
+    feasible. The other knockouts are solved one after another on the same
+    solver, so each solve starts from the basis left by the previous one.
+    """
+    original_biomass = model.slim_optimize(error_value=0.0)
+    wt_fluxes = flux_vector(model)
+
+    reductions = []
+    for reaction, wt_flux in zip(model.reactions, wt_fluxes):
+        if skip_idle and abs(wt_flux) <= FLUX_TOLERANCE:
+            reductions.append(0.0)
+            continue
+
+        # Temporarily knock out the reaction
+        with model:
+            reaction.knock_out()
+            biomass = model.slim_optimize(error_value=0.0)
+        reductions.append((original_biomass - biomass) / original_biomass * 100)
+    return reductions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single reaction deletion screen.")
+    parser.add_argument("--model", default="iTP251.xml", help="SBML model to screen")
+    parser.add_argument("--full", action="store_true", help="solve every knockout, including zero-flux reactions")
+    parser.add_argument("--output", default="essential_reactions2.xlsx",
+                        help="output name; the result is saved as .arrow, and as this .xlsx with --excel")
+    parser.add_argument("--excel", action="store_true", help="also export the result to --output")
+    parser.add_argument("--profile", default=None,
+                        help="log per-stage timings and LP counters to this file (see python -m tptools.profiling)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+
+    # Load the model
+    with profiling.stage("load_model"):
+        model = load_model(args.model)
+
+    with profiling.stage("knockouts"):
+        reductions = biomass_reductions(model, skip_idle=not args.full)
+
+    # Create a DataFrame to store the results
+    results_df = pd.DataFrame({
+        'Reaction': [reaction.id for reaction in model.reactions],
+        'Biomass Reduction (%)': reductions,
+        'Enzyme': [reaction.name for reaction in model.reactions]  # Use the reaction name as the pathway
+    })
+
+    # Save the DataFrame, and export it to an Excel file if asked
+    with profiling.stage("write_output"):
+        written = save_output(args.output, {"Biomass Reduction": results_df}, metadata={"model": args.model}, excel=args.excel)
+
+    print(f"Analysis complete. All reactions saved to {', '.join(written)}")
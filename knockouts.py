@@ -0,0 +1,81 @@
+import multiprocessing
+
+from tptools import profiling
+from tptools.models import load_model
+from tptools.solver import flux_vector
+
+# A knockout is essential if growth drops to 10% of the wild type or less
+ESSENTIAL_THRESHOLD = 0.10
+
+# Model held by each worker process, loaded once and reused for every knockout
+_worker_model = None
+
+
+def init_worker(model_path, objective):
+    """Loads the model once per worker so its solver stays warm between knockouts.
+
+    Also used by the parent process for serial runs; returns the loaded model.
+    """
+    global _worker_model
+    _worker_model = load_model(model_path)
+    _worker_model.objective = _worker_model.reactions.get_by_id(objective)
+    return _worker_model
+
+
+@profiling.task
+def _reaction_knockout_growth(reaction_ids):
+    """Knocks out a set of reactions inside a model context and returns the resulting growth."""
+    with _worker_model:
+        for rxn_id in reaction_ids:
+            _worker_model.reactions.get_by_id(rxn_id).knock_out()
+        return reaction_ids, _worker_model.slim_optimize(error_value=0.0)
+
+
+@profiling.task
+def _reaction_knockout_solution(reaction_ids):
+    """Like _reaction_knockout_growth, but also returns the knockout fluxes (None if infeasible)."""
+    with _worker_model:
+        for rxn_id in reaction_ids:
+            _worker_model.reactions.get_by_id(rxn_id).knock_out()
+        growth = _worker_model.slim_optimize(error_value=None)
+        if growth is None:
+            return reaction_ids, (0.0, None)
+        return reaction_ids, (growth, flux_vector(_worker_model))
+
+
+def knockout_map(model, genes=None):
+    """Returns a {gene: frozenset of reaction ids} map of the reactions each gene knockout disables.
+
+    Only the reactions a gene takes part in are evaluated, since no other GPR rule
+    can change when that gene is removed.
+    """
+    genes = model.genes if genes is None else genes
+    return {
+        gene.id: frozenset(rxn.id for rxn in gene.reactions if not rxn.gpr.eval(knockouts={gene.id}))
+        for gene in genes
+    }
+
+
+def group_by_knockout(ko_map):
+    """Groups keys that disable the same reactions into a {reaction set: [keys]} map."""
+    groups = {}
+    for key, reaction_ids in ko_map.items():
+        groups.setdefault(reaction_ids, []).append(key)
+    return groups
+
+
+def solve_knockouts(reaction_sets, model_path, objective="bio1_biomass", processes=1, fluxes=False):
+    """Returns a {reaction set: growth} map, solving every set once on the worker model(s).
+
+    With fluxes=True the values are (growth, flux vector) tuples instead. For
+    processes=1 the sets are solved on the model loaded by init_worker in this process.
+    """
+    task = _reaction_knockout_solution if fluxes else _reaction_knockout_growth
+    tasks = [tuple(sorted(reaction_ids)) for reaction_ids in reaction_sets]
+    if processes == 1:
+        return {frozenset(reaction_ids): result for reaction_ids, result in map(task, tasks)}
+
+    chunksize = max(1, len(tasks) // (4 * processes))
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(model_path, objective)) as pool:
+        results = pool.imap_unordered(task, tasks, chunksize=chunksize)
+        return {frozenset(reaction_ids): result for reaction_ids, result in results}
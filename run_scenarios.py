@@ -0,0 +1,18 @@
+import argparse
+
+from tptools import profiling
+from tptools.scenarios import ScenarioRunner, run_scenarios
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pcGEM scenario conditions, loading each model once.")
+    parser.add_argument("scenarios", nargs="+", help="scenario JSON files, e.g. pcGEM_*/scenarios.json")
+    parser.add_argument("--only", nargs="+", default=None, help="condition names to run (default: all)")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes for phase planes")
+    parser.add_argument("--excel", action="store_true", help="also export every output to its .xlsx")
+    parser.add_argument("--profile", default=None,
+                        help="log per-stage timings and LP counters to this file (see python -m tptools.profiling)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+
+    run_scenarios(args.scenarios, names=args.only, runner=ScenarioRunner(args.processes), excel=args.excel)
@@ -0,0 +1 @@
+"""Shared helpers for the iTP251 / ec-iTP251 analysis scripts."""
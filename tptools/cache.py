@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import pickle
+
+# Cached artefacts live here unless TPTOOLS_CACHE points elsewhere
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tptools")
+
+
+def cache_dir():
+    """Returns the cache directory, creating it if needed."""
+    path = os.environ.get("TPTOOLS_CACHE", DEFAULT_CACHE_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stamped_digest(path):
+    """Returns file_digest(path), re-hashing the file only when its size or mtime changed since it was last seen.
+
+    The digests are remembered in digests.json in the cache directory, keyed
+    by absolute path.
+    """
+    index_path = os.path.join(cache_dir(), "digests.json")
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    entry = index.get(key)
+    if entry is not None and entry["stamp"] == stamp:
+        return entry["digest"]
+
+    digest = file_digest(path)
+    index[key] = {"stamp": stamp, "digest": digest}
+    atomic_write(index_path, lambda f: f.write(json.dumps(index, indent=1).encode()))
+    return digest
+
+
+def cache_path(digest, kind):
+    """Returns the cache file for the artefact `kind` derived from content with the given digest."""
+    return os.path.join(cache_dir(), f"{digest}.{kind}")
+
+
+def atomic_write(path, write):
+    """Calls write(file) on a temporary file and renames it into place, so readers never see partial files."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def cached_pickle(path, build):
+    """Returns the unpickled contents of path, building and pickling them with build() on a miss."""
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        value = build()
+        atomic_write(path, lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from tptools.stoich import stoichiometric_matrix
+
+
+class CofactorIndex:
+    """Producer and consumer incidence of every metabolite of a model, built once from its stoichiometry.
+
+    producers holds the positive and consumers the negated negative
+    coefficients of S (metabolites x reactions, CSR), so S = producers -
+    consumers. Forward flux through a reaction produces what it has in
+    producers and consumes what it has in consumers; reverse flux does the
+    opposite. Reports over many flux vectors are then sparse matrix products
+    instead of scans of each metabolite's reactions.
+    """
+
+    def __init__(self, S, reaction_ids, metabolite_ids):
+        S = sparse.csr_matrix(S)
+        self.producers = S.maximum(0).tocsr()
+        self.consumers = (-S).maximum(0).tocsr()
+        self.reaction_ids = list(reaction_ids)
+        self.metabolite_ids = list(metabolite_ids)
+        self._rows = {metabolite_id: i for i, metabolite_id in enumerate(self.metabolite_ids)}
+
+    @classmethod
+    def from_model(cls, model):
+        S, _, _, reaction_ids, metabolite_ids = stoichiometric_matrix(model)
+        return cls(S, reaction_ids, metabolite_ids)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Builds the index from a tptools.models.load_arrays snapshot, without a cobra model."""
+        return cls(arrays["S"], arrays["reaction_ids"], arrays["metabolite_ids"])
+
+    def rows(self, metabolite_ids):
+        """Returns the row positions of metabolites; raises KeyError for an unknown id."""
+        return np.array([self._rows[metabolite_id] for metabolite_id in metabolite_ids], dtype=int)
+
+    def producing_reactions(self, metabolite_id):
+        """Returns the positions, in model order, of the reactions that produce a metabolite when run forward."""
+        return self.producers[self.rows([metabolite_id])[0]].indices.copy()
+
+    def producer_table(self, fluxes, metabolite_id):
+        """Returns a DataFrame of the reactions producing a metabolite and their fluxes, in model order.
+
+        fluxes is one flux vector in model order (an array or a Series).
+        """
+        positions = np.sort(self.producing_reactions(metabolite_id))
+        return pd.DataFrame({
+            "Reaction ID": [self.reaction_ids[j] for j in positions],
+            "Flux": np.asarray(fluxes, dtype=float)[positions],
+        })
+
+    def turnover(self, fluxes, metabolite_ids):
+        """Returns the production and consumption rates of metabolites for a batch of flux vectors.
+
+        fluxes is an (n_solutions x n_reactions) array in model order, or one
+        vector. Returns (production, consumption), both (n_solutions x
+        len(metabolite_ids)) arrays computed with one sparse product each;
+        their difference is S @ v for those metabolites. NaN flux vectors
+        (e.g. infeasible sweep points) give NaN rates.
+        """
+        fluxes = np.atleast_2d(np.asarray(fluxes, dtype=float))
+        forward = np.maximum(fluxes, 0).T
+        reverse = np.maximum(-fluxes, 0).T
+        rows = self.rows(metabolite_ids)
+        producers, consumers = self.producers[rows], self.consumers[rows]
+        production = producers @ forward + consumers @ reverse
+        consumption = consumers @ forward + producers @ reverse
+        return production.T, consumption.T
+
+
+def turnover_table(index, fluxes, cofactors, row_index=None):
+    """Returns a DataFrame of the production and consumption of each {name: metabolite id} per flux vector."""
+    production, consumption = index.turnover(fluxes, list(cofactors.values()))
+    columns = {}
+    for k, name in enumerate(cofactors):
+        columns[f"{name} Production"] = production[:, k]
+        columns[f"{name} Consumption"] = consumption[:, k]
+    return pd.DataFrame(columns, index=row_index)
@@ -0,0 +1,124 @@
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from cobra.util.solver import assert_optimal
+from optlang.symbolics import Zero
+
+from tptools import profiling
+from tptools.scenarios import load_condition_model
+from tptools.solver import FLUX_TOLERANCE, flux_vector, set_objective, total_flux_coefficients
+
+# Model held by each worker process and the objective coefficients of its last reaction
+_fva_model = None
+_fva_previous = {}
+
+
+def _init_worker(condition, fraction_of_optimum):
+    """Loads the condition's model once per worker and holds biomass at the fraction of its optimum.
+
+    Also used by the parent process for the pre-pass and serial runs; returns
+    the loaded model. The worker owns its model, so nothing is reverted.
+    Raises cobra's Infeasible (or another OptimizationError) if the biomass
+    optimum cannot be found.
+    """
+    global _fva_model, _fva_previous
+    _fva_model, constraint = load_condition_model(condition)
+    optimum = _fva_model.slim_optimize()
+    assert_optimal(_fva_model, f"Maximizing biomass of condition {condition['name']!r} failed")
+
+    biomass = _fva_model.reactions.get_by_id(condition["biomass_reaction"])
+    biomass_floor = _fva_model.problem.Constraint(biomass.flux_expression, lb=optimum * fraction_of_optimum)
+    _fva_model.add_cons_vars([biomass_floor])
+
+    # Every reaction's objective is written into this one, changing only its own two coefficients
+    _fva_model.objective = _fva_model.problem.Objective(Zero, direction="min", sloppy=True)
+    _fva_previous = {}
+    return _fva_model
+
+
+@profiling.task
+def _solve_range(task):
+    """Minimizes and/or maximizes one reaction's net flux; returns its index and (minimum, maximum).
+
+    Sides that are not asked for are NaN.
+    """
+    global _fva_previous
+    i, solve_min, solve_max = task
+    reaction = _fva_model.reactions[i]
+    coefficients = {reaction.forward_variable: 1.0, reaction.reverse_variable: -1.0}
+    _fva_model.objective.set_linear_coefficients({**{variable: 0.0 for variable in _fva_previous}, **coefficients})
+    _fva_previous = coefficients
+
+    bounds = [np.nan, np.nan]
+    for side, (direction, solve) in enumerate((("min", solve_min), ("max", solve_max))):
+        if solve:
+            _fva_model.objective.direction = direction
+            bounds[side] = _fva_model.slim_optimize(error_value=np.nan)
+    return i, bounds
+
+
+def flux_sum_pass(model):
+    """Returns the net fluxes of the minimum and of the maximum total flux solutions.
+
+    Any reaction sitting at one of its bounds in either solution provably
+    attains that bound, so that side of its range needs no LP of its own.
+    Raises an OptimizationError if either solve is not optimal.
+    """
+    solutions = []
+    for direction in ("min", "max"):
+        set_objective(model, total_flux_coefficients(model), direction)
+        model.slim_optimize()
+        assert_optimal(model, f"The {direction}imum total flux pre-pass failed")
+        solutions.append(flux_vector(model))
+    set_objective(model, {}, "min")
+    return solutions
+
+
+def flux_ranges(condition, fraction_of_optimum=1.0, processes=1):
+    """Flux variability analysis of a condition under its bounds and protein budget.
+
+    Biomass is held at fraction_of_optimum of its maximum. Range sides that are
+    already settled are not solved: both sides of reactions fixed by their
+    bounds, and every side attained in the flux-sum pre-pass (see
+    flux_sum_pass). The remaining reactions are split into chunks across the
+    worker processes, each of which keeps one model and solves its reactions
+    one after another, so each LP starts from the previous basis.
+
+    Returns a dict with the "ranges" (a DataFrame of minimum and maximum net
+    flux indexed by reaction id, like cobra's flux_variability_analysis, NaN
+    where an LP failed) and the number of "lps" solved for them.
+    """
+    model = _init_worker(condition, fraction_of_optimum)
+    lb = np.array([reaction.lower_bound for reaction in model.reactions])
+    ub = np.array([reaction.upper_bound for reaction in model.reactions])
+
+    at_lb = lb == ub
+    at_ub = lb == ub
+    # Fluxes within FLUX_TOLERANCE of a reaction bound are taken to attain it
+    for fluxes in flux_sum_pass(model):
+        at_lb |= np.abs(fluxes - lb) <= FLUX_TOLERANCE
+        at_ub |= np.abs(fluxes - ub) <= FLUX_TOLERANCE
+    minimum = np.where(at_lb, lb, np.nan)
+    maximum = np.where(at_ub, ub, np.nan)
+
+    tasks = [(i, not at_lb[i], not at_ub[i]) for i in np.flatnonzero(~(at_lb & at_ub))]
+    lps = int((~at_lb).sum() + (~at_ub).sum())
+
+    def collect(results):
+        for i, (low, high) in results:
+            if not at_lb[i]:
+                minimum[i] = low
+            if not at_ub[i]:
+                maximum[i] = high
+
+    if processes == 1:
+        collect(map(_solve_range, tasks))
+    else:
+        chunksize = max(1, len(tasks) // (4 * processes))
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(condition, fraction_of_optimum)) as pool:
+            collect(pool.imap_unordered(_solve_range, tasks, chunksize=chunksize))
+
+    index = pd.Index([reaction.id for reaction in model.reactions], name="Reaction ID")
+    ranges = pd.DataFrame({"minimum": minimum, "maximum": maximum}, index=index)
+    return {"ranges": ranges, "lps": lps}
@@ -0,0 +1,398 @@
+import os
+import re
+
+import highspy
+import numpy as np
+import scipy.sparse as sp
+
+from tptools.solver import FLUX_TOLERANCE
+from tptools.stoich import stoichiometric_matrix
+
+# Gas constant (kJ/mol/K) and temperature (K) of the GAMS MDF model
+R = 0.008314
+T = 310.15
+
+# Constraint marginals above this magnitude mark a reaction as an MDF bottleneck
+MARGINAL_TOLERANCE = 1e-9
+
+# (metabolite, reference, ratio) log-concentration ratios fixed according to Noor et al. 2014:
+# ATP = 10 ADP and NADH = 0.1 NAD
+FIXED_RATIOS = (("C00002", "C00008", 10.0), ("C00004", "C00003", 0.1))
+
+# Concentration bounds of compounds that MDF/cmin.txt and cmax.txt do not list
+DEFAULT_CMIN = 1.0
+DEFAULT_CMAX = 1e7
+
+# Water and H+ are held at concentration 1 (log concentration 0) in genome-scale MDF
+FIXED_COMPOUNDS = ("C00001", "C00080")
+
+
+def read_gams_table(path):
+    """Reads a GAMS `/ ... /` data statement into a list of (key tuple, value) rows.
+
+    Keys are the quoted labels of a row ('C00002' or 'C00002'.'R01786'); value
+    is None for plain set members.
+    """
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line == "/":
+                continue
+            labels = re.findall(r"'([^']*)'", line)
+            rest = line[line.rindex("'") + 1:].split()
+            rows.append((tuple(labels), float(rest[0]) if rest else None))
+    return rows
+
+
+class MDFModel:
+    """Max-min driving force LP of a pathway, built once and solved for any delta_G_o and concentration bounds.
+
+    Same formulation as MDF/TP_central_pathway_MDF.gms: maximize B subject to
+    -deltaG(j) >= B with deltaG(j) = delta_G_o(j) + RT sum_i S(i,j) x(i), where x(i) is the log
+    concentration of metabolite i, bounded by log(Cmin) and log(Cmax) and, as
+    a GAMS positive variable, by 0. The constraint matrix only depends on S,
+    so it is loaded into one HiGHS model once and every solve only changes
+    the right-hand side and the variable bounds.
+    """
+
+    def __init__(self, metabolites, reactions, S, delta_g0, cmin, cmax, fixed_ratios=FIXED_RATIOS):
+        self.metabolites = list(metabolites)
+        self.reactions = list(reactions)
+        self.S = sp.csr_matrix(S)
+        self.delta_g0 = np.asarray(delta_g0, dtype=float)
+        self.cmin = np.asarray(cmin, dtype=float)
+        self.cmax = np.asarray(cmax, dtype=float)
+
+        # Variables are [x, B]: minimize -B subject to RT S^T x + B <= -delta_G_o and the fixed ratios
+        n_met = len(self.metabolites)
+        A = sp.hstack([R * T * self.S.T, np.ones((len(self.reactions), 1))], format="csr")
+        index = {metabolite: i for i, metabolite in enumerate(self.metabolites)}
+        ratios = [(index[a], index[b], ratio) for a, b, ratio in fixed_ratios if a in index and b in index]
+        if ratios:
+            A_eq = sp.lil_matrix((len(ratios), n_met + 1))
+            for row, (a, b, ratio) in enumerate(ratios):
+                A_eq[row, a] = 1.0
+                A_eq[row, b] = -ratio
+            A = sp.vstack([A, A_eq], format="csr")
+
+        self._highs = highspy.Highs()
+        self._highs.setOptionValue("output_flag", False)
+        lower, upper = self._log_bounds(self.cmin, self.cmax)
+        self._highs.addCols(
+            n_met + 1, np.append(np.zeros(n_met), -1.0), np.append(lower, -np.inf), np.append(upper, np.inf),
+            0, np.array([], dtype=np.int32), np.array([], dtype=np.int32), np.array([], dtype=float),
+        )
+        self._highs.addRows(
+            A.shape[0], np.append(np.full(len(self.reactions), -np.inf), np.zeros(len(ratios))),
+            np.append(-self.delta_g0, np.zeros(len(ratios))),
+            A.nnz, A.indptr[:-1].astype(np.int32), A.indices.astype(np.int32), A.data,
+        )
+        self._rows = np.arange(len(self.reactions), dtype=np.int32)
+        self._columns = np.arange(n_met, dtype=np.int32)
+
+    @classmethod
+    def from_gams(cls, directory, fixed_ratios=FIXED_RATIOS):
+        """Reads the metabolites, reactions, sij, deltaGo, cmin and cmax include files of the GAMS model."""
+        def table(name):
+            return read_gams_table(os.path.join(directory, name))
+
+        metabolites = [labels[0] for labels, value in table("metabolites.txt")]
+        reactions = [labels[0] for labels, value in table("reactions.txt")]
+        met_index = {metabolite: i for i, metabolite in enumerate(metabolites)}
+        rxn_index = {reaction: j for j, reaction in enumerate(reactions)}
+
+        sij = table("sij.txt")
+        S = sp.coo_matrix((
+            [value for labels, value in sij],
+            ([met_index[labels[0]] for labels, value in sij], [rxn_index[labels[1]] for labels, value in sij]),
+        ), shape=(len(metabolites), len(reactions)))
+
+        def vector(name, index):
+            # Labels missing from a GAMS parameter table default to 0
+            values = np.zeros(len(index))
+            for labels, value in table(name):
+                values[index[labels[0]]] = value
+            return values
+
+        return cls(
+            metabolites, reactions, S, vector("deltaGo.txt", rxn_index),
+            vector("cmin.txt", met_index), vector("cmax.txt", met_index), fixed_ratios,
+        )
+
+    def _log_bounds(self, cmin, cmax):
+        """Returns the lower and upper bounds of x for concentration bounds of any shape."""
+        with np.errstate(divide="ignore"):
+            return np.maximum(np.log(cmin), 0.0), np.log(cmax)
+
+    def _solve(self, delta_g0, lower, upper):
+        """Solves the LP for one right-hand side (-delta_G_o) and one set of bounds on x.
+
+        Only the driving force rows' upper bounds and the bounds of x are
+        changed, so HiGHS restarts the simplex from the previous solve's basis.
+        """
+        self._highs.changeRowsBounds(len(self._rows), self._rows, np.full(len(self._rows), -np.inf), -delta_g0)
+        self._highs.changeColsBounds(len(self._columns), self._columns, lower, upper)
+        self._highs.run()
+        if self._highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            # Drop the basis of a failed solve so that the next one starts afresh
+            self._highs.clearSolver()
+            return {
+                "mdf": np.nan,
+                "delta_g": np.full(len(self.reactions), np.nan),
+                "log_concentrations": np.full(len(self.metabolites), np.nan),
+                "marginals": np.full(len(self.reactions), np.nan),
+            }
+
+        solution = self._highs.getSolution()
+        col_value = np.array(solution.col_value)
+        # Adding 0.0 turns the solver's -0.0 into 0.0, which GAMS would have printed
+        x = col_value[:-1] + 0.0
+        return {
+            "mdf": col_value[-1],
+            "delta_g": delta_g0 + R * T * (self.S.T @ x),
+            "log_concentrations": x,
+            "marginals": np.array(solution.row_dual)[:len(self.reactions)],
+        }
+
+    def solve(self, delta_g0=None, cmin=None, cmax=None):
+        """Solves the MDF LP, by default with the model's own delta_G_o and concentration bounds.
+
+        Returns a dict with the driving force "mdf" (B), the reactions'
+        "delta_g", the metabolites' "log_concentrations" and the "marginals" of
+        the reactions' driving force constraints (nonzero for the bottleneck
+        reactions), all NaN if the LP has no solution.
+        """
+        delta_g0 = self.delta_g0 if delta_g0 is None else np.asarray(delta_g0, dtype=float)
+        cmin = self.cmin if cmin is None else np.asarray(cmin, dtype=float)
+        cmax = self.cmax if cmax is None else np.asarray(cmax, dtype=float)
+        return self._solve(delta_g0, *self._log_bounds(cmin, cmax))
+
+    def solve_batch(self, delta_g0=None, cmin=None, cmax=None):
+        """Solves the MDF LP once per row of the given (sets x reactions or sets x metabolites) arrays.
+
+        Arguments left as None, or given as one vector, are shared by every set.
+        The right-hand sides and bounds of all sets are computed in one
+        vectorized step, then each set is solved by the same HiGHS model,
+        warm started from the basis of the set before it. Returns the solve() dict with an
+        extra leading set axis on every array.
+        """
+        delta_g0 = np.atleast_2d(self.delta_g0 if delta_g0 is None else np.asarray(delta_g0, dtype=float))
+        cmin = np.atleast_2d(self.cmin if cmin is None else np.asarray(cmin, dtype=float))
+        cmax = np.atleast_2d(self.cmax if cmax is None else np.asarray(cmax, dtype=float))
+        n_sets = max(len(delta_g0), len(cmin), len(cmax))
+
+        delta_g0 = np.broadcast_to(delta_g0, (n_sets, len(self.reactions)))
+        lower, upper = (np.broadcast_to(bound, (n_sets, len(self.metabolites))) for bound in self._log_bounds(cmin, cmax))
+
+        results = [self._solve(delta_g0[k], lower[k], upper[k]) for k in range(n_sets)]
+        return {key: np.array([result[key] for result in results]) for key in results[0]}
+
+    def sample(self, n_samples, delta_g0_sd, log_bound_sd=0.0, seed=None):
+        """Monte Carlo MDF over normally distributed delta_G_o and log-normally perturbed concentration bounds.
+
+        delta_G_o is drawn around the model's values with standard deviation
+        delta_g0_sd (kJ/mol, a scalar or one value per reaction); Cmin and Cmax
+        are multiplied by exp of independent normal draws with standard
+        deviation log_bound_sd. All draws are made in one call each.
+
+        Returns the solve_batch() dict plus the sampled "delta_g0", "cmin" and
+        "cmax" and the "bottleneck_frequency" of every reaction: the fraction of
+        the feasible samples in which its constraint has a nonzero marginal.
+        """
+        rng = np.random.default_rng(seed)
+        delta_g0 = self.delta_g0 + rng.normal(0.0, 1.0, (n_samples, len(self.reactions))) * delta_g0_sd
+        cmin = self.cmin * np.exp(rng.normal(0.0, log_bound_sd, (n_samples, len(self.metabolites))))
+        cmax = self.cmax * np.exp(rng.normal(0.0, log_bound_sd, (n_samples, len(self.metabolites))))
+
+        results = self.solve_batch(delta_g0, cmin, cmax)
+        feasible = np.isfinite(results["mdf"])
+        bottlenecks = np.abs(results["marginals"][feasible]) > MARGINAL_TOLERANCE
+        results.update({
+            "delta_g0": delta_g0,
+            "cmin": cmin,
+            "cmax": cmax,
+            "bottleneck_frequency": bottlenecks.mean(axis=0) if feasible.any() else np.full(len(self.reactions), np.nan),
+        })
+        return results
+
+    def write_results(self, result, directory):
+        """Writes DELTAG.txt and CONCENTRATION.txt in the layout of the GAMS model's PUT statements."""
+        with open(os.path.join(directory, "DELTAG.txt"), "w") as f:
+            f.write("reaction      deltaG\n")
+            for reaction, value in zip(self.reactions, result["delta_g"]):
+                f.write(f"{reaction}    {value:20.5f}\n")
+        with open(os.path.join(directory, "CONCENTRATION.txt"), "w") as f:
+            f.write("metabolites      concentration\n")
+            for metabolite, value in zip(self.metabolites, result["log_concentrations"]):
+                f.write(f"{metabolite}    {value:20.8f}\n")
+
+    def write_samples(self, results, directory):
+        """Writes MDF_SAMPLES.txt (one MDF per sample) and BOTTLENECK.txt (bottleneck frequency per reaction)."""
+        with open(os.path.join(directory, "MDF_SAMPLES.txt"), "w") as f:
+            f.write("sample      mdf\n")
+            for k, value in enumerate(results["mdf"]):
+                f.write(f"{k}    {value:20.5f}\n")
+        with open(os.path.join(directory, "BOTTLENECK.txt"), "w") as f:
+            f.write("reaction      frequency\n")
+            for reaction, value in zip(self.reactions, results["bottleneck_frequency"]):
+                f.write(f"{reaction}    {value:20.5f}\n")
+
+
+def solve_pathways(directories, write=True):
+    """Solves the GAMS MDF inputs of several pathway directories in one process.
+
+    Returns a {directory: result} map and, with write=True, writes each
+    directory's DELTAG.txt and CONCENTRATION.txt next to its inputs.
+    """
+    results = {}
+    for directory in directories:
+        model = MDFModel.from_gams(directory)
+        results[directory] = model.solve()
+        if write:
+            model.write_results(results[directory], directory)
+    return results
+
+
+def sample_pathways(directories, n_samples, delta_g0_sd, log_bound_sd=0.0, seed=None, write=True):
+    """Monte Carlo MDF (see MDFModel.sample) of several pathway directories in one process.
+
+    Returns a {directory: results} map and, with write=True, writes each
+    directory's MDF_SAMPLES.txt and BOTTLENECK.txt next to its inputs.
+    """
+    results = {}
+    for directory in directories:
+        model = MDFModel.from_gams(directory)
+        results[directory] = model.sample(n_samples, delta_g0_sd, log_bound_sd, seed)
+        if write:
+            model.write_samples(results[directory], directory)
+    return results
+
+
+def _annotation_ids(annotation, key):
+    """Returns the identifiers of one annotation key as a list (annotations hold a string or a list)."""
+    value = annotation.get(key)
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+class GenomeMDF:
+    """MDF of the active subnetwork of any flux solution of a genome-scale model.
+
+    The model's stoichiometry, KEGG compound annotations, delta_G_o values and
+    concentration bounds are gathered once; each solve only selects the
+    active columns. Active reactions are oriented along their flux, so a
+    reaction running backwards is constrained with -delta_G_o. Reactions
+    without a delta_G_o are left out of the LP and reported as uncovered.
+    """
+
+    def __init__(self, model, delta_g0, concentration_bounds=None, fixed_ratios=FIXED_RATIOS,
+                 fixed_compounds=FIXED_COMPOUNDS):
+        S, lb, ub, self.reaction_ids, self.metabolite_ids = stoichiometric_matrix(model)
+        self.S = S.tocsc()
+        self.delta_g0 = np.asarray(delta_g0, dtype=float)
+
+        concentration_bounds = concentration_bounds or {}
+        compounds = [(_annotation_ids(met.annotation, "kegg.compound") or [None])[0] for met in model.metabolites]
+        self.cmin = np.full(len(compounds), DEFAULT_CMIN)
+        self.cmax = np.full(len(compounds), DEFAULT_CMAX)
+        for i, compound in enumerate(compounds):
+            if compound in fixed_compounds:
+                self.cmin[i] = self.cmax[i] = 1.0
+            elif compound in concentration_bounds:
+                self.cmin[i], self.cmax[i] = concentration_bounds[compound]
+
+        # The KEGG compound ratios apply between metabolites of the same compartment
+        by_compound = {
+            (compound, met.compartment): met.id for compound, met in zip(compounds, model.metabolites) if compound
+        }
+        self.fixed_ratios = [
+            (by_compound[a, compartment], by_compound[b, compartment], ratio)
+            for a, b, ratio in fixed_ratios for compartment in model.compartments
+            if (a, compartment) in by_compound and (b, compartment) in by_compound
+        ]
+
+    @classmethod
+    def from_gams(cls, model, directory, **kwargs):
+        """Takes delta_G_o and concentration bounds from the GAMS include files of an MDF pathway.
+
+        Model reactions are matched to the pathway's KEGG reactions through
+        their kegg.reaction annotation. Each one is oriented by comparing the
+        signs of the KEGG compounds it shares with the pathway's column, so the
+        _f and _b halves of a split reaction get opposite delta_G_o values.
+        """
+        pathway = MDFModel.from_gams(directory)
+        pathway_S = pathway.S.tocsc()
+        columns = {
+            reaction: dict(zip(
+                (pathway.metabolites[i] for i in pathway_S[:, j].indices), pathway_S[:, j].data
+            ))
+            for j, reaction in enumerate(pathway.reactions)
+        }
+        pathway_delta_g0 = dict(zip(pathway.reactions, pathway.delta_g0))
+
+        delta_g0 = np.full(len(model.reactions), np.nan)
+        for j, rxn in enumerate(model.reactions):
+            for kegg_reaction in _annotation_ids(rxn.annotation, "kegg.reaction"):
+                if kegg_reaction not in columns:
+                    continue
+                agreement = sum(
+                    np.sign(coeff) * np.sign(columns[kegg_reaction].get(compound, 0.0))
+                    for met, coeff in rxn.metabolites.items()
+                    for compound in _annotation_ids(met.annotation, "kegg.compound")[:1]
+                )
+                if agreement:
+                    delta_g0[j] = np.sign(agreement) * pathway_delta_g0[kegg_reaction]
+                    break
+
+        concentration_bounds = {
+            metabolite: (low, high) for metabolite, low, high in zip(pathway.metabolites, pathway.cmin, pathway.cmax)
+        }
+        return cls(model, delta_g0, concentration_bounds, **kwargs)
+
+    def subnetwork(self, fluxes):
+        """Returns the MDFModel of a solution's active reactions with a delta_G_o, and the uncovered reaction ids.
+
+        fluxes is a flux vector in model order or a Series indexed by reaction id.
+        """
+        if hasattr(fluxes, "reindex"):
+            fluxes = fluxes.reindex(self.reaction_ids).to_numpy()
+        fluxes = np.asarray(fluxes, dtype=float)
+
+        active = np.abs(fluxes) > FLUX_TOLERANCE
+        covered = np.flatnonzero(active & np.isfinite(self.delta_g0))
+        uncovered = [self.reaction_ids[j] for j in np.flatnonzero(active & ~np.isfinite(self.delta_g0))]
+
+        direction = np.sign(fluxes[covered])
+        S = self.S[:, covered] @ sp.diags(direction)
+        rows = np.unique(S.tocoo().row)
+        model = MDFModel(
+            [self.metabolite_ids[i] for i in rows], [self.reaction_ids[j] for j in covered], S[rows],
+            self.delta_g0[covered] * direction, self.cmin[rows], self.cmax[rows], self.fixed_ratios,
+        )
+        return model, uncovered
+
+    def solve(self, fluxes):
+        """Solves the MDF of a solution's active subnetwork (see subnetwork).
+
+        Returns the MDFModel.solve() dict plus the subnetwork's "reactions" and
+        "metabolites", the "bottlenecks" (reactions whose driving force
+        constraint has a nonzero marginal) and the "uncovered" active reactions.
+        """
+        model, uncovered = self.subnetwork(fluxes)
+        if not model.reactions:
+            result = {"mdf": np.nan, "delta_g": np.array([]), "log_concentrations": np.array([]),
+                      "marginals": np.array([])}
+        else:
+            result = model.solve()
+        result.update({
+            "reactions": model.reactions,
+            "metabolites": model.metabolites,
+            "bottlenecks": [
+                reaction for reaction, marginal in zip(model.reactions, result["marginals"])
+                if abs(marginal) > MARGINAL_TOLERANCE
+            ],
+            "uncovered": uncovered,
+        })
+        return result
@@ -0,0 +1,56 @@
+import cobra
+import numpy as np
+from cobra.io import model_from_dict, model_to_dict
+from cobra.util.solver import linear_reaction_coefficients
+from scipy import sparse
+
+from tptools.cache import atomic_write, cache_path, cached_pickle, file_digest
+from tptools.stoich import stoichiometric_matrix
+
+
+def load_model(path):
+    """Loads an SBML model through a cache keyed on the SHA-256 of the file's contents.
+
+    The cache holds the model as a plain dict (cobra's JSON structure), which
+    rebuilds about twice as fast as parsing the XML (iTP251: 0.9 s against
+    1.8 s in benchmarks/run_benchmarks.py). Identical files in different
+    directories share one cache entry.
+    """
+    model_dict = cached_pickle(
+        cache_path(file_digest(path), "model.pkl"),
+        lambda: model_to_dict(cobra.io.read_sbml_model(path)),
+    )
+    return model_from_dict(model_dict)
+
+
+def load_arrays(path):
+    """Returns an array snapshot of an SBML model without building a cobra model.
+
+    The result is a dict with the CSR stoichiometric matrix "S", the bound
+    vectors "lb"/"ub", the objective coefficients "c" and the "reaction_ids" /
+    "metabolite_ids" lists, all in model order. Once cached this loads in
+    milliseconds, which suits code that builds its own LP from the matrix.
+    """
+    snapshot = cache_path(file_digest(path), "arrays.npz")
+    try:
+        data = np.load(snapshot)
+    except OSError:
+        model = load_model(path)
+        S, lb, ub, reaction_ids, metabolite_ids = stoichiometric_matrix(model)
+        coefficients = {rxn.id: coeff for rxn, coeff in linear_reaction_coefficients(model).items()}
+        c = np.array([coefficients.get(rxn_id, 0.0) for rxn_id in reaction_ids])
+        atomic_write(snapshot, lambda f: np.savez(
+            f, data=S.data, indices=S.indices, indptr=S.indptr, shape=S.shape, lb=lb, ub=ub, c=c,
+            reaction_ids=np.array(reaction_ids), metabolite_ids=np.array(metabolite_ids),
+        ))
+        data = np.load(snapshot)
+
+    with data:
+        return {
+            "S": sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"])),
+            "lb": data["lb"],
+            "ub": data["ub"],
+            "c": data["c"],
+            "reaction_ids": data["reaction_ids"].tolist(),
+            "metabolite_ids": data["metabolite_ids"].tolist(),
+        }
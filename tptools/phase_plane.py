@@ -0,0 +1,92 @@
+import multiprocessing
+
+import numpy as np
+
+from tptools import profiling
+from tptools.scenarios import load_condition_model
+
+# Model, substrate reaction and protein cost constraint held by each worker process
+_plane_model = None
+_plane_substrate = None
+_plane_constraint = None
+
+
+def _init_worker(condition):
+    """Loads the condition's model once per worker, with its bounds and an open protein cost constraint.
+
+    Also used by the parent process for serial runs. The worker owns its model,
+    so the bounds set here and by _solve_row are never reverted.
+    """
+    global _plane_model, _plane_substrate, _plane_constraint
+    _plane_model, _plane_constraint = load_condition_model(condition, budget=(0, None))
+    _plane_substrate = _plane_model.reactions.get_by_id(condition["substrate_uptake"]["reaction"])
+    return _plane_model
+
+
+@profiling.task
+def _solve_row(task):
+    """Fixes the substrate uptake and maximizes biomass at every budget of one grid row.
+
+    Budgets are solved in order on the same solver, so each solve starts from
+    the basis of the previous one. Returns the row index and its biomass,
+    substrate reduced cost and protein cost dual (NaN where infeasible).
+    """
+    i, uptake, budgets = task
+    _plane_substrate.bounds = (uptake, uptake)
+
+    biomass = np.full(len(budgets), np.nan)
+    reduced_cost = np.full(len(budgets), np.nan)
+    dual = np.full(len(budgets), np.nan)
+    for j, budget in enumerate(budgets):
+        _plane_constraint.ub = budget
+        mu = _plane_model.slim_optimize(error_value=np.nan)
+        if np.isnan(mu):
+            continue
+        biomass[j] = mu
+        reduced_cost[j] = _plane_substrate.forward_variable.dual - _plane_substrate.reverse_variable.dual
+        dual[j] = _plane_constraint.dual
+    return i, biomass, reduced_cost, dual
+
+
+def phenotype_phase_plane(condition, uptakes, budgets, processes=1):
+    """Maximizes biomass over a grid of substrate uptake rates and protein budgets.
+
+    condition is a scenario condition (see tptools.scenarios.load_scenarios);
+    its substrate_uptake reaction is fixed to each of the uptakes and the total
+    protein cost is capped at each of the budgets. Grid rows (one uptake, all
+    budgets) are spread over the worker processes, each of which loads the
+    model once.
+
+    Returns a dict with the "uptakes" and "budgets" and, as uptakes x budgets
+    arrays, the maximum "biomass", the "substrate_reduced_cost" of the uptake
+    reaction and the "budget_dual" of the protein cost constraint. Infeasible
+    points are NaN in all three.
+    """
+    uptakes = np.asarray(uptakes, dtype=float)
+    budgets = np.sort(np.asarray(budgets, dtype=float))
+    tasks = [(i, uptake, budgets) for i, uptake in enumerate(uptakes)]
+
+    shape = (len(uptakes), len(budgets))
+    result = {
+        "uptakes": uptakes,
+        "budgets": budgets,
+        "biomass": np.full(shape, np.nan),
+        "substrate_reduced_cost": np.full(shape, np.nan),
+        "budget_dual": np.full(shape, np.nan),
+    }
+
+    def collect(rows):
+        for i, biomass, reduced_cost, dual in rows:
+            result["biomass"][i] = biomass
+            result["substrate_reduced_cost"][i] = reduced_cost
+            result["budget_dual"][i] = dual
+
+    if processes == 1:
+        _init_worker(condition)
+        collect(map(_solve_row, tasks))
+        return result
+
+    chunksize = max(1, len(tasks) // (4 * processes))
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(condition,)) as pool:
+        collect(pool.imap_unordered(_solve_row, tasks, chunksize=chunksize))
+    return result
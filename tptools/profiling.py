@@ -0,0 +1,241 @@
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+import weakref
+from contextlib import contextmanager
+
+import optlang.interface
+
+# Setting this to a log path turns profiling on, also in worker processes started later
+ENV_VAR = "TPTOOLS_PROFILE"
+
+# Per-process state: the log path (None when off), the open stage path, and the totals since the last flush
+_log_path = None
+_stack = []
+_stages = {}
+_counters = {}
+_gauges = {}
+_optlang_optimize = None
+
+# Solver problems solved before in this process; solving one again starts from its last basis
+_solved = weakref.WeakSet()
+
+
+def enabled():
+    return _log_path is not None
+
+
+def enable(path):
+    """Turns profiling on for this process and the worker processes it starts, logging to path.
+
+    Also times every LP solved through optlang (cobra's solvers) as an "lp"
+    stage with its counters (see solve_counters). Totals are appended to
+    the log by flush(), which runs at exit.
+    """
+    global _log_path, _optlang_optimize
+    _log_path = os.path.abspath(path)
+    os.environ[ENV_VAR] = _log_path
+    if _optlang_optimize is None:
+        _optlang_optimize = optlang.interface.Model.optimize
+
+        def optimize(model):
+            return solve(model.problem, lambda: _optlang_optimize(model))
+
+        optlang.interface.Model.optimize = optimize
+        atexit.register(flush)
+
+
+def _add_stage(path, seconds, self_seconds):
+    totals = _stages.setdefault(path, [0, 0.0, 0.0])
+    totals[0] += 1
+    totals[1] += seconds
+    totals[2] += self_seconds
+
+
+@contextmanager
+def stage(name):
+    """Times a block as a stage nested in the enclosing ones; does nothing while profiling is off."""
+    if _log_path is None:
+        yield
+        return
+    _stack.append([name, 0.0])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        path = ";".join(entry[0] for entry in _stack)
+        _, child_seconds = _stack.pop()
+        if _stack:
+            _stack[-1][1] += seconds
+        _add_stage(path, seconds, seconds - child_seconds)
+
+
+def count(name, value=1):
+    """Adds value to a counter of the current stage."""
+    if _log_path is not None:
+        counters = _counters.setdefault(";".join(entry[0] for entry in _stack), {})
+        counters[name] = counters.get(name, 0) + value
+
+
+def gauge(name, value):
+    """Records the largest value seen of a quantity of the current stage, such as LP size."""
+    if _log_path is not None:
+        gauges = _gauges.setdefault(";".join(entry[0] for entry in _stack), {})
+        gauges[name] = max(gauges.get(name, value), value)
+
+
+def solve_counters(problem, warm):
+    """Counts one LP solve of a gurobipy model (or of another solver's problem, without its details).
+
+    Counters: lp_solves, warm_starts (repeat solves of the same model, which
+    start from the basis of its previous solve) and simplex_iterations;
+    gauges: lp_rows and lp_columns.
+    """
+    count("lp_solves")
+    if warm:
+        count("warm_starts")
+    if hasattr(problem, "IterCount"):
+        count("simplex_iterations", int(problem.IterCount))
+        gauge("lp_rows", problem.NumConstrs)
+        gauge("lp_columns", problem.NumVars)
+
+
+def solve(problem, optimize=None):
+    """Runs optimize() (default problem.optimize()) as an "lp" stage and counts the solve.
+
+    problem is the solver's own model, e.g. a gurobipy.Model.
+    """
+    optimize = optimize or problem.optimize
+    if _log_path is None:
+        return optimize()
+    try:
+        warm = problem in _solved
+        _solved.add(problem)
+    except TypeError:
+        warm = False
+    with stage("lp"):
+        result = optimize()
+        solve_counters(problem, warm)
+    return result
+
+
+def task(function):
+    """Decorates a worker task: runs it as a stage named after it and flushes the totals afterwards.
+
+    Worker processes may be terminated without running exit handlers, so
+    each finished task writes out its own totals.
+    """
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        if _log_path is None:
+            return function(*args, **kwargs)
+        with stage(function.__name__):
+            result = function(*args, **kwargs)
+        flush()
+        return result
+
+    return run
+
+
+def _reset_in_child():
+    """Drops the totals a forked process inherits, which are its parent's to report."""
+    _stages.clear()
+    _counters.clear()
+    _gauges.clear()
+    _solved.clear()
+
+
+os.register_at_fork(after_in_child=_reset_in_child)
+
+
+def flush():
+    """Appends this process's totals since the last flush to the log as one JSON line."""
+    if _log_path is None or not (_stages or _counters or _gauges):
+        return
+    record = {
+        "pid": os.getpid(),
+        "time": time.time(),
+        "argv": sys.argv,
+        "stages": {path: dict(zip(("calls", "seconds", "self_seconds"), totals)) for path, totals in _stages.items()},
+        "counters": _counters,
+        "gauges": _gauges,
+    }
+    with open(_log_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    _stages.clear()
+    _counters.clear()
+    _gauges.clear()
+
+
+def read_log(path):
+    """Returns the summed stage totals, counters and largest gauges of every process in a log.
+
+    The result is a dict of "stages" ({path: {"calls", "seconds",
+    "self_seconds"}}), "counters" and "gauges" (both {path: {name: value}}).
+    """
+    stages, counters, gauges = {}, {}, {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            for stage_path, totals in record["stages"].items():
+                summed = stages.setdefault(stage_path, {"calls": 0, "seconds": 0.0, "self_seconds": 0.0})
+                for key, value in totals.items():
+                    summed[key] += value
+            for stage_path, values in record["counters"].items():
+                summed = counters.setdefault(stage_path, {})
+                for name, value in values.items():
+                    summed[name] = summed.get(name, 0) + value
+            for stage_path, values in record["gauges"].items():
+                largest = gauges.setdefault(stage_path, {})
+                for name, value in values.items():
+                    largest[name] = max(largest.get(name, value), value)
+    return {"stages": stages, "counters": counters, "gauges": gauges}
+
+
+def folded_stacks(profile):
+    """Returns the stages of read_log() as folded stack lines ("a;b;c <microseconds>") of self time.
+
+    This is the input format of flamegraph.pl, speedscope and inferno.
+    """
+    return [
+        f"{path} {round(totals['self_seconds'] * 1e6)}"
+        for path, totals in sorted(profile["stages"].items())
+        if totals["self_seconds"] > 0
+    ]
+
+
+def report(profile):
+    """Prints every stage's calls, total and self time, and its counters, slowest self time first."""
+    stages = profile["stages"]
+    total_self = sum(totals["self_seconds"] for totals in stages.values()) or 1.0
+    print(f"{'stage':<60} {'calls':>8} {'total s':>10} {'self s':>10} {'self %':>7}")
+    for path, totals in sorted(stages.items(), key=lambda item: -item[1]["self_seconds"]):
+        print(f"{path:<60} {totals['calls']:>8} {totals['seconds']:>10.3f} {totals['self_seconds']:>10.3f} "
+              f"{100 * totals['self_seconds'] / total_self:>6.1f}%")
+        values = {**profile["counters"].get(path, {}), **profile["gauges"].get(path, {})}
+        if values:
+            print("    " + ", ".join(f"{name}={value}" for name, value in sorted(values.items())))
+
+
+# Worker processes started after enable() pick it up from the environment
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a tptools profiling log.")
+    parser.add_argument("log", help="JSON Lines log written with --profile")
+    parser.add_argument("--folded", default=None, help="also write folded stacks for a flame graph to this file")
+    args = parser.parse_args()
+
+    profile = read_log(args.log)
+    report(profile)
+    if args.folded:
+        with open(args.folded, "w") as f:
+            f.write("\n".join(folded_stacks(profile)) + "\n")
+        print(f"Folded stacks written to {args.folded}")
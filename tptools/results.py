@@ -0,0 +1,78 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from tptools.cache import atomic_write
+
+
+def result_path(output):
+    """Returns the result directory of an output file name: its extension replaced by .arrow."""
+    return os.path.splitext(output)[0] + ".arrow"
+
+
+def _table_file(path, index):
+    return os.path.join(path, f"table_{index:02d}.arrow")
+
+
+def save_result(path, tables, metadata=None):
+    """Saves named DataFrames and run metadata as a directory of Arrow IPC files.
+
+    tables is a {name: DataFrame} map, written in order as one uncompressed
+    Arrow file each, so they can be memory-mapped on reading. Non-default
+    indexes are kept. metadata is any JSON-serializable dict describing the
+    run. Every file is renamed into place only once it is complete.
+    """
+    os.makedirs(path, exist_ok=True)
+    for index, df in enumerate(tables.values()):
+        table = pa.Table.from_pandas(df.rename(columns=str))
+
+        def write(f, table=table):
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+
+        atomic_write(_table_file(path, index), write)
+
+    meta = json.dumps({"tables": list(tables), "metadata": metadata or {}}, indent=2, default=str)
+    atomic_write(os.path.join(path, "meta.json"), lambda f: f.write(meta.encode()))
+
+
+def read_meta(path):
+    """Returns the {"tables": [names], "metadata": {...}} record of a saved result."""
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_table(path, name):
+    """Returns one table of a saved result as a memory-mapped pyarrow Table (no copy is made)."""
+    index = read_meta(path)["tables"].index(name)
+    with pa.memory_map(_table_file(path, index)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def load_result(path):
+    """Returns every table of a saved result as a {name: DataFrame} map."""
+    return {name: load_table(path, name).to_pandas() for name in read_meta(path)["tables"]}
+
+
+def export_excel(path, excel_path=None):
+    """Writes a saved result to an Excel workbook with one sheet per table; returns the workbook path.
+
+    excel_path defaults to the result directory with .xlsx in place of .arrow.
+    """
+    excel_path = excel_path or os.path.splitext(path)[0] + ".xlsx"
+    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        for name, df in load_result(path).items():
+            df.to_excel(writer, sheet_name=name, index=not isinstance(df.index, pd.RangeIndex))
+    return excel_path
+
+
+def save_output(output, tables, metadata=None, excel=False):
+    """Saves tables as the result of an output file (see result_path), exporting output itself only with excel.
+
+    Returns the paths written.
+    """
+    path = result_path(output)
+    save_result(path, tables, metadata)
+    return [path, export_excel(path, output)] if excel else [path]
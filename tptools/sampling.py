@@ -0,0 +1,231 @@
+import math
+import multiprocessing
+import shutil
+
+import numpy as np
+import pandas as pd
+from cobra.sampling import ACHRSampler
+from cobra.util.solver import assert_optimal
+
+from tptools import profiling
+from tptools.scenarios import load_condition_model
+from tptools.solver import FLUX_TOLERANCE
+from tptools.store import ChunkStore
+
+# Per-chunk arrays of a sample store: the chunk's chain, its samples and their moments and extremes
+SAMPLE_ARRAYS = ("chain", "fluxes", "mean", "m2", "minimum", "maximum")
+
+# Sampler shared by the chains of each worker process, and the store they write to
+_sampler = None
+_store = None
+
+
+def build_sampler(condition, fraction_of_optimum=1.0, thinning=100, seed=None):
+    """Builds an ACHR sampler of a condition's flux space at its protein budget and a fixed biomass flux.
+
+    Biomass is fixed to fraction_of_optimum of its maximum under the
+    condition's bounds and budget. Building the sampler solves the warmup LPs
+    (two per variable), so it is done once and shared by every chain.
+    Raises cobra's Infeasible (or another OptimizationError) if the biomass
+    optimum cannot be found.
+    """
+    model, constraint = load_condition_model(condition)
+    optimum = model.slim_optimize()
+    assert_optimal(model, f"Maximizing biomass of condition {condition['name']!r} failed")
+    biomass = model.reactions.get_by_id(condition["biomass_reaction"])
+    biomass.bounds = (optimum * fraction_of_optimum, optimum * fraction_of_optimum)
+    return ACHRSampler(model, thinning=thinning, seed=seed)
+
+
+def _init_worker(sampler, store_path):
+    """Keeps the parent's sampler and opens the sample store once per worker; also used for serial runs."""
+    global _sampler, _store
+    _sampler = sampler
+    _store = ChunkStore(store_path)
+
+
+@profiling.task
+def _run_chain(task):
+    """Runs one chain from the warmup center and writes each chunk of samples to the store as it is drawn.
+
+    The chain draws from its own seed (ACHRSampler uses numpy's global random
+    state), so chains sharing a worker are independent of the order they run
+    in. Returns the chain number.
+    """
+    chain, chunks, burn_in, seed = task
+    np.random.seed(seed)
+    _sampler.prev = _sampler.center = _sampler.warmup.mean(axis=0)
+    _sampler.n_samples = 0
+    if burn_in:
+        _sampler.sample(burn_in)
+
+    for index in chunks:
+        fluxes = _sampler.sample(_store.chunk_size).to_numpy()
+        mean = fluxes.mean(axis=0)
+        _store.write_chunk(
+            index, chain=np.array([chain]), fluxes=fluxes, mean=mean, m2=((fluxes - mean) ** 2).sum(axis=0),
+            minimum=fluxes.min(axis=0), maximum=fluxes.max(axis=0),
+        )
+    return chain
+
+
+def sample_fluxes(condition, store_path, n_samples, chains=4, thinning=100, burn_in=0, chunk_size=1000,
+                  fraction_of_optimum=1.0, seed=None, processes=1):
+    """Samples a condition's flux space with parallel ACHR chains, streaming the samples to a ChunkStore.
+
+    The sampler is built once (see build_sampler) and handed to the worker
+    processes, each of which runs whole chains. Every chain keeps one sample
+    in thinning after discarding burn_in samples, and draws n_samples rounded
+    up to whole chunks of chunk_size; chunk c * chunks_per_chain + k of the
+    store is chunk k of chain c. Only one chunk per chain is held in memory,
+    so the run's length is bounded by disk space rather than RAM. Any
+    previous samples at store_path are replaced.
+
+    Returns the store; summarize(store) gives the flux statistics and
+    convergence diagnostics.
+    """
+    with profiling.stage("warmup"):
+        sampler = build_sampler(condition, fraction_of_optimum, thinning, seed)
+    n_chunks = math.ceil(n_samples / chunk_size)
+    seed = sampler._seed if seed is None else seed
+    tasks = [
+        (chain, range(chain * n_chunks, (chain + 1) * n_chunks), burn_in, (seed + chain) % np.iinfo(np.int32).max)
+        for chain in range(chains)
+    ]
+
+    shutil.rmtree(store_path, ignore_errors=True)
+    columns = [reaction.id for reaction in sampler.model.reactions]
+    store = ChunkStore(store_path, columns=columns, chunk_size=chunk_size, arrays=SAMPLE_ARRAYS)
+
+    if processes == 1:
+        _init_worker(sampler, store_path)
+        done = map(_run_chain, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(sampler, store_path))
+        done = pool.imap_unordered(_run_chain, tasks)
+    try:
+        for chain in done:
+            print(f"Chain {chain} done ({n_chunks * chunk_size} samples)")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return store
+
+
+def cofactor_turnover(store, index, cofactors):
+    """Returns the distribution of each {name: metabolite id} cofactor's production and consumption over the samples.
+
+    Turnover is computed for one chunk of samples at a time with
+    index.turnover (see tptools.cofactors.CofactorIndex). Returns a DataFrame
+    indexed by name with the mean, standard deviation and central 95% range
+    of both rates.
+    """
+    metabolite_ids = list(cofactors.values())
+    if not metabolite_ids:
+        return pd.DataFrame(index=pd.Index([], name="Cofactor"))
+    rates = {"Production": [], "Consumption": []}
+    for _, fluxes in store.iter_chunks("fluxes"):
+        production, consumption = index.turnover(fluxes, metabolite_ids)
+        rates["Production"].append(production)
+        rates["Consumption"].append(consumption)
+
+    columns = {}
+    for label, parts in rates.items():
+        values = np.concatenate(parts)
+        low, high = np.percentile(values, [2.5, 97.5], axis=0)
+        columns[f"Mean {label}"] = values.mean(axis=0)
+        columns[f"SD {label}"] = values.std(axis=0, ddof=1)
+        columns[f"{label} 2.5%"] = low
+        columns[f"{label} 97.5%"] = high
+    return pd.DataFrame(columns, index=pd.Index(list(cofactors), name="Cofactor"))
+
+
+def chunk_moments(store):
+    """Returns the per-chunk moments of a sample store as (chains x chunks x reactions) arrays.
+
+    The result is a dict of the "mean", "m2" (sum of squared deviations),
+    "minimum" and "maximum" of every chunk and the chunk size "n". Only these
+    small arrays are read, never the samples.
+    """
+    chains = store.read("chain")
+    order = np.argsort(chains, kind="stable")
+    n_chains = len(np.unique(chains))
+    moments = {}
+    for name in ("mean", "m2", "minimum", "maximum"):
+        blocks = np.stack([array for _, array in store.iter_chunks(name)])[order]
+        moments[name] = blocks.reshape(n_chains, -1, blocks.shape[-1])
+    moments["n"] = store.chunk_size
+    return moments
+
+
+def merge_moments(mean, m2, n):
+    """Merges the moments of equal-sized blocks of n samples along the second-last axis.
+
+    Returns (count, mean, m2) of the merged blocks (Chan et al.'s pairwise
+    update, done for all blocks at once).
+    """
+    merged_mean = mean.mean(axis=-2)
+    merged_m2 = m2.sum(axis=-2) + n * ((mean - merged_mean[..., None, :]) ** 2).sum(axis=-2)
+    return n * mean.shape[-2], merged_mean, merged_m2
+
+
+def gelman_rubin(count, chain_mean, chain_m2):
+    """Returns the potential scale reduction factor (R-hat) of every reaction over chains of count samples.
+
+    R-hat is NaN for reactions whose flux never varies within a chain.
+    """
+    within = (chain_m2 / (count - 1)).mean(axis=0)
+    between = count * chain_mean.var(axis=0, ddof=1)
+    pooled = (count - 1) / count * within + between / count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(within > 0, np.sqrt(pooled / within), np.nan)
+
+
+def geweke(moments, first=0.1, last=0.5):
+    """Returns every chain's Geweke z-score per reaction, as a (chains x reactions) array.
+
+    The mean of the first fraction of each chain is compared with the mean of
+    its last fraction, both rounded to whole chunks. The variances are taken
+    as those of independent samples, which thinning approximates. NaN where a
+    chain has fewer than two chunks or the flux does not vary.
+    """
+    n_chunks = moments["mean"].shape[1]
+    if n_chunks < 2:
+        return np.full(moments["mean"].shape[::2], np.nan)
+    head = max(1, round(first * n_chunks))
+    tail = min(n_chunks - head, max(1, round(last * n_chunks)))
+
+    count_a, mean_a, m2_a = merge_moments(moments["mean"][:, :head], moments["m2"][:, :head], moments["n"])
+    count_b, mean_b, m2_b = merge_moments(moments["mean"][:, -tail:], moments["m2"][:, -tail:], moments["n"])
+    spread = m2_a / (count_a - 1) / count_a + m2_b / (count_b - 1) / count_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(spread > 0, (mean_a - mean_b) / np.sqrt(spread), np.nan)
+
+
+def summarize(store):
+    """Returns the flux statistics and convergence diagnostics of a sample store, indexed by reaction id.
+
+    Columns: the pooled mean, standard deviation, minimum and maximum of every
+    flux, its R-hat over the chains (see gelman_rubin) and the largest
+    absolute Geweke z-score of any chain (see geweke). Both diagnostics are
+    NaN for fluxes that do not vary.
+    """
+    moments = chunk_moments(store)
+    count, chain_mean, chain_m2 = merge_moments(moments["mean"], moments["m2"], moments["n"])
+    total, mean, m2 = merge_moments(chain_mean[None], chain_m2[None], count)
+    std = np.sqrt(m2[0] / (total - 1))
+    rhat = gelman_rubin(count, chain_mean, chain_m2) if len(chain_mean) > 1 else np.full(len(std), np.nan)
+    z = np.fmax.reduce(np.abs(geweke(moments)), axis=0)
+
+    # Round-off in fixed fluxes would otherwise show up as huge R-hat and z values
+    fixed = std <= FLUX_TOLERANCE
+    return pd.DataFrame({
+        "mean": mean[0],
+        "std": std,
+        "minimum": moments["minimum"].min(axis=(0, 1)),
+        "maximum": moments["maximum"].max(axis=(0, 1)),
+        "rhat": np.where(fixed, np.nan, rhat),
+        "geweke": np.where(fixed, np.nan, z),
+    }, index=pd.Index(store.columns, name="Reaction ID"))
@@ -0,0 +1,474 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from cobra.flux_analysis import pfba
+from optlang.symbolics import Zero
+
+from tptools import profiling
+from tptools.cache import file_digest
+from tptools.cofactors import CofactorIndex, turnover_table
+from tptools.mdf import GenomeMDF
+from tptools.models import load_arrays, load_model
+from tptools.results import save_output
+from tptools.sweep import protein_budget_sweep
+from tptools.workbooks import load_protein_costs
+
+# Keys of a scenario file that hold paths relative to the file itself
+PATH_KEYS = ("model", "protein_costs", "output", "mdf")
+
+
+def load_scenarios(path):
+    """Returns the conditions of a scenario file as a list of dicts.
+
+    A scenario file is a JSON object whose top-level settings are defaults for
+    every entry under "conditions"; each condition can override any of them.
+    Settings understood by ScenarioRunner:
+
+    - model, protein_costs, output: file paths, relative to the scenario file;
+      output names the .xlsx, and the result is saved next to it as .arrow
+    - zero_bounds: reactions fixed to (0, 0)
+    - amino_acid_uptake: {"reactions": [...], "upper_bound": ub}, bounded to (0, ub)
+    - substrate_uptake: {"reaction": id, "value": v}, fixed to (v, v)
+    - biomass: value the biomass reaction is fixed to (optional)
+    - protein_budget: [lb, ub] of the total protein cost constraint (optional)
+    - analysis: "min_protein_cost" or "max_biomass", both followed by pFBA,
+      "protein_sweep" for maximum biomass and pFBA over a range of budgets,
+      "phase_plane" for maximum biomass over a grid of uptakes and budgets,
+      "fva" for flux variability analysis at the condition's protein budget, or
+      "flux_sampling" for ACHR sampling at the budget and a fixed biomass flux
+    - budgets: the sweep's budgets, a list or {"start": a, "stop": b, "num": n}
+    - uptakes: the phase plane's substrate uptake rates, given like budgets
+    - fraction_of_optimum: fraction of maximum biomass FVA holds, or sampling
+      fixes biomass to (default 1.0)
+    - samples, chains, thinning, burn_in, chunk_size, seed: the sampling run
+      (see tptools.sampling.sample_fluxes); its samples are streamed to a
+      .samples store next to the output
+    - fixed_budget: sweep with the total protein cost fixed to (rather than
+      capped at) each budget
+    - cofactors: {sheet name: metabolite id} of producing-reaction tables to export;
+      sweeps and sampling also report each one's production and consumption
+    - mdf: directory of GAMS MDF include files whose delta_G_o values are used to
+      check the pFBA solution's thermodynamic feasibility (see tptools.mdf.GenomeMDF)
+    """
+    with open(path) as f:
+        doc = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = {key: value for key, value in doc.items() if key not in ("description", "conditions")}
+
+    conditions = []
+    for name, settings in doc["conditions"].items():
+        condition = {"biomass_reaction": "bio1_biomass", **defaults, **settings, "name": name}
+        for key in PATH_KEYS:
+            if condition.get(key):
+                condition[key] = os.path.join(base, condition[key])
+        conditions.append(condition)
+    return conditions
+
+
+def protein_cost_vector(model, path):
+    """Returns the protein cost of every model reaction from a kcat/MW workbook, in model order (0 if uncosted)."""
+    return load_protein_costs(path, [reaction.id for reaction in model.reactions])
+
+
+def protein_cost_coefficients(model, cost_vector):
+    """Returns the solver coefficients of the total protein cost, i.e. of cost times net flux.
+
+    Each costed reaction contributes its cost on the forward variable and minus
+    its cost on the reverse variable, the same terms as its flux_expression.
+    """
+    coefficients = {}
+    for reaction, cost in zip(model.reactions, cost_vector):
+        if cost:
+            coefficients[reaction.forward_variable] = cost
+            coefficients[reaction.reverse_variable] = -cost
+    return coefficients
+
+
+def add_protein_cost_constraint(model, coefficients, lb, ub):
+    """Adds a total protein cost constraint with the given bounds and returns it.
+
+    The constraint is created empty and filled in with set_linear_coefficients,
+    which skips building a symbolic expression of hundreds of terms.
+    """
+    constraint = model.problem.Constraint(Zero, lb=lb, ub=ub, sloppy=True)
+    model.add_cons_vars([constraint])
+    model.solver.update()
+    constraint.set_linear_coefficients(coefficients)
+    return constraint
+
+
+def total_protein_cost(fluxes, cost_vector):
+    """Returns the total protein cost of a flux Series in model reaction order."""
+    return float(np.dot(fluxes.values, cost_vector))
+
+
+def apply_bounds(model, condition):
+    """Applies a condition's bounds to the model; call inside `with model:` so they are reverted."""
+    for reaction_id in condition.get("zero_bounds", []):
+        model.reactions.get_by_id(reaction_id).bounds = (0, 0)
+
+    amino_acids = condition.get("amino_acid_uptake")
+    if amino_acids:
+        for reaction_id in amino_acids["reactions"]:
+            model.reactions.get_by_id(reaction_id).bounds = (0, amino_acids["upper_bound"])
+
+    substrate = condition.get("substrate_uptake")
+    if substrate:
+        model.reactions.get_by_id(substrate["reaction"]).bounds = (substrate["value"], substrate["value"])
+
+    if condition.get("biomass") is not None:
+        model.reactions.get_by_id(condition["biomass_reaction"]).bounds = (condition["biomass"], condition["biomass"])
+
+
+def referenced_ids(condition):
+    """Returns the (reaction ids, metabolite ids) a condition refers to in its model."""
+    reaction_ids = [condition["biomass_reaction"], *condition.get("zero_bounds", [])]
+    if condition.get("amino_acid_uptake"):
+        reaction_ids.extend(condition["amino_acid_uptake"]["reactions"])
+    if condition.get("substrate_uptake"):
+        reaction_ids.append(condition["substrate_uptake"]["reaction"])
+    return reaction_ids, list(condition.get("cofactors", {}).values())
+
+
+def load_condition_model(condition, budget=None):
+    """Loads a private copy of a condition's model with its bounds and protein cost constraint applied.
+
+    Meant for worker processes, which own their model, so nothing is reverted.
+    budget is the (lb, ub) of the protein cost constraint and defaults to the
+    condition's protein_budget; with neither, no constraint is added. The
+    objective is the condition's biomass reaction. Returns the model and the
+    constraint (or None).
+    """
+    model = load_model(condition["model"])
+    apply_bounds(model, condition)
+    model.objective = model.reactions.get_by_id(condition["biomass_reaction"])
+
+    budget = budget if budget is not None else condition.get("protein_budget")
+    if budget is None:
+        return model, None
+    cost_vector = protein_cost_vector(model, condition["protein_costs"])
+    constraint = add_protein_cost_constraint(model, protein_cost_coefficients(model, cost_vector), budget[0], budget[1])
+    return model, constraint
+
+
+class ScenarioRunner:
+    """Runs scenario conditions against models and cost tables that are each loaded only once.
+
+    Models are keyed on their file's content hash, so identical copies in
+    different condition directories share one model. Every condition runs
+    inside a model context, leaving the shared model unchanged afterwards.
+    Phase planes and FVA are solved on their own worker models, and flux
+    sampling chains on copies of one sampler, in processes worker processes.
+    """
+
+    def __init__(self, processes=1):
+        self.processes = processes
+        self._models = {}
+        self._coefficients = {}
+        self._mdf = {}
+        self._cofactors = {}
+
+    def model(self, path):
+        digest = file_digest(path)
+        if digest not in self._models:
+            with profiling.stage("load_model"):
+                self._models[digest] = load_model(path)
+        return self._models[digest]
+
+    def cofactor_index(self, model_path):
+        """Returns the CofactorIndex of a model, built once per model file from its cached arrays."""
+        digest = file_digest(model_path)
+        if digest not in self._cofactors:
+            self._cofactors[digest] = CofactorIndex.from_arrays(load_arrays(model_path))
+        return self._cofactors[digest]
+
+    def missing_ids(self, condition):
+        """Returns the reaction and metabolite ids a condition refers to that its model lacks, in condition order."""
+        arrays = load_arrays(condition["model"])
+        reaction_ids, metabolite_ids = referenced_ids(condition)
+        known_reactions, known_metabolites = set(arrays["reaction_ids"]), set(arrays["metabolite_ids"])
+        return (
+            [reaction_id for reaction_id in reaction_ids if reaction_id not in known_reactions]
+            + [metabolite_id for metabolite_id in metabolite_ids if metabolite_id not in known_metabolites]
+        )
+
+    def genome_mdf(self, model_path, directory):
+        """Returns the GenomeMDF of a model with the delta_G_o values of an MDF directory, built once per pair."""
+        key = (file_digest(model_path), directory)
+        if key not in self._mdf:
+            self._mdf[key] = GenomeMDF.from_gams(self.model(model_path), directory)
+        return self._mdf[key]
+
+    def cost_coefficients(self, model, costs_path):
+        """Returns the (cost vector, solver coefficients) of a cost table on a model, built once per pair."""
+        key = (id(model), costs_path)
+        if key not in self._coefficients:
+            cost_vector = protein_cost_vector(model, costs_path)
+            self._coefficients[key] = cost_vector, protein_cost_coefficients(model, cost_vector)
+        return self._coefficients[key]
+
+    def add_budget_constraint(self, model, condition, lb, ub):
+        """Adds the total protein cost constraint with the given bounds and returns it."""
+        _, coefficients = self.cost_coefficients(model, condition["protein_costs"])
+        return add_protein_cost_constraint(model, coefficients, lb, ub)
+
+    def prepare(self, model, condition):
+        """Applies a condition's bounds and protein budget; call inside `with model:`.
+
+        Returns the protein cost constraint, or None if the condition has no budget.
+        """
+        apply_bounds(model, condition)
+        budget = condition.get("protein_budget")
+        if budget is None:
+            return None
+        return self.add_budget_constraint(model, condition, budget[0], budget[1])
+
+    def sweep(self, condition):
+        """Runs a protein budget sweep (see tptools.sweep.protein_budget_sweep) for one condition.
+
+        With cofactors, the result also holds the production and consumption
+        of each cofactor at every budget as "turnover".
+        """
+        model = self.model(condition["model"])
+        with model:
+            apply_bounds(model, condition)
+            constraint = self.add_budget_constraint(model, condition, 0, None)
+            result = protein_budget_sweep(
+                model, constraint, condition["biomass_reaction"], budget_range(condition["budgets"]),
+                fixed=condition.get("fixed_budget", False),
+            )
+        if condition.get("cofactors"):
+            metabolite_ids = {metabolite_id: metabolite_id for metabolite_id in condition["cofactors"].values()}
+            result["turnover"] = turnover_table(
+                self.cofactor_index(condition["model"]), result["fluxes"], metabolite_ids,
+                pd.Index(result["budgets"], name="Protein Budget"),
+            )
+        return result
+
+    def sample(self, condition):
+        """Samples a condition's fluxes (see tptools.sampling.sample_fluxes) and summarizes them.
+
+        Returns the store's path, the number of samples, the per-reaction
+        summary, cofactor tables of the producing reactions' mean and
+        standard deviation of flux, and the distribution of each cofactor's
+        production and consumption over the samples as "turnover".
+        """
+        from tptools.sampling import cofactor_turnover, sample_fluxes, summarize
+        store = sample_fluxes(
+            condition, os.path.splitext(condition["output"])[0] + ".samples", condition["samples"],
+            chains=condition.get("chains", 4), thinning=condition.get("thinning", 100),
+            burn_in=condition.get("burn_in", 0), chunk_size=condition.get("chunk_size", 1000),
+            fraction_of_optimum=condition.get("fraction_of_optimum", 1.0), seed=condition.get("seed"),
+            processes=self.processes,
+        )
+        summary = summarize(store)
+
+        index = self.cofactor_index(condition["model"])
+        cofactors = {}
+        for sheet, metabolite_id in condition.get("cofactors", {}).items():
+            table = index.producer_table(summary["mean"], metabolite_id).rename(columns={"Flux": "Mean Flux"})
+            table["SD"] = summary["std"].reindex(table["Reaction ID"]).to_numpy()
+            cofactors[sheet] = table
+        return {
+            "store": store.path,
+            "samples": len(store.completed_chunks()) * store.chunk_size,
+            "summary": summary,
+            "cofactors": cofactors,
+            "turnover": cofactor_turnover(store, index, condition.get("cofactors", {})),
+        }
+
+    def run(self, condition):
+        """Runs one condition and returns its fluxes, biomass flux, protein cost, cofactor tables and
+        (if the condition has an mdf directory) the MDF of its active subnetwork.
+
+        protein_sweep, phase_plane, fva and flux_sampling conditions return the
+        result of sweep(), tptools.phase_plane.phenotype_phase_plane,
+        tptools.fva.flux_ranges or sample() instead.
+        """
+        if condition["analysis"] == "protein_sweep":
+            return self.sweep(condition)
+        if condition["analysis"] == "phase_plane":
+            # Imported here because tptools.phase_plane builds its worker models with this module's helpers
+            from tptools.phase_plane import phenotype_phase_plane
+            return phenotype_phase_plane(
+                condition, budget_range(condition["uptakes"]), budget_range(condition["budgets"]), self.processes
+            )
+        if condition["analysis"] == "fva":
+            from tptools.fva import flux_ranges
+            return flux_ranges(condition, condition.get("fraction_of_optimum", 1.0), self.processes)
+        if condition["analysis"] == "flux_sampling":
+            return self.sample(condition)
+
+        model = self.model(condition["model"])
+        cost_vector, coefficients = self.cost_coefficients(model, condition["protein_costs"])
+        with model:
+            with profiling.stage("prepare"):
+                self.prepare(model, condition)
+            if condition["analysis"] == "min_protein_cost":
+                # A fresh objective, so the coefficients set here are dropped when the context restores the old one
+                model.objective = model.problem.Objective(Zero, direction='min', sloppy=True)
+                model.objective.set_linear_coefficients(coefficients)
+            elif condition["analysis"] == "max_biomass":
+                model.objective = model.reactions.get_by_id(condition["biomass_reaction"])
+            else:
+                raise ValueError(f"Unknown analysis {condition['analysis']!r} in condition {condition['name']!r}")
+
+            # Run parsimonious FBA (pFBA)
+            with profiling.stage("pfba"):
+                fluxes = pfba(model).fluxes
+
+        mdf = None
+        if condition.get("mdf"):
+            with profiling.stage("mdf"):
+                mdf = self.genome_mdf(condition["model"], condition["mdf"]).solve(fluxes)
+
+        with profiling.stage("cofactors"):
+            index = self.cofactor_index(condition["model"])
+            cofactors = {
+                sheet: index.producer_table(fluxes, metabolite_id)
+                for sheet, metabolite_id in condition.get("cofactors", {}).items()
+            }
+        return {
+            "fluxes": fluxes,
+            "biomass_flux": fluxes.get(condition["biomass_reaction"]),
+            "total_protein_cost": total_protein_cost(fluxes, cost_vector),
+            "cofactors": cofactors,
+            "mdf": mdf,
+        }
+
+
+def budget_range(budgets):
+    """Returns the budgets (or uptakes) of a sweep given as a list or as {"start", "stop", "num"}."""
+    if isinstance(budgets, dict):
+        return np.linspace(budgets["start"], budgets["stop"], budgets["num"])
+    return np.asarray(budgets, dtype=float)
+
+
+def result_tables(result):
+    """Returns a condition's pFBA fluxes, cofactor tables and MDF as {table name: DataFrame}."""
+    tables = {
+        "Reactions Flux": pd.DataFrame({
+            "Reaction ID": result["fluxes"].index,
+            "Flux": result["fluxes"].values
+        })
+    }
+    tables.update(result["cofactors"])
+    if result.get("mdf") is not None:
+        mdf = result["mdf"]
+        tables["MDF"] = pd.DataFrame({
+            "Reaction ID": mdf["reactions"],
+            "deltaG": mdf["delta_g"],
+            "Bottleneck": [reaction in mdf["bottlenecks"] for reaction in mdf["reactions"]]
+        })
+    return tables
+
+
+def sweep_tables(result):
+    """Returns a protein budget sweep's biomass curve, pFBA fluxes and cofactor turnover as {table name: DataFrame}."""
+    tables = {
+        "Biomass": pd.DataFrame({
+            "Protein Budget": result["budgets"],
+            "Biomass": result["biomass"]
+        }),
+        "Reactions Flux": pd.DataFrame(
+            result["fluxes"].T, index=pd.Index(result["reaction_ids"], name="Reaction ID"), columns=result["budgets"]
+        ),
+    }
+    if result.get("turnover") is not None:
+        tables["Cofactor Turnover"] = result["turnover"]
+    return tables
+
+
+def phase_plane_tables(result):
+    """Returns a phase plane's biomass surface and shadow prices as {table name: DataFrame}."""
+    sheets = {
+        "Biomass": "biomass",
+        "Substrate Reduced Cost": "substrate_reduced_cost",
+        "Protein Budget Dual": "budget_dual",
+    }
+    index = pd.Index(result["uptakes"], name="Substrate Uptake")
+    return {sheet: pd.DataFrame(result[key], index=index, columns=result["budgets"]) for sheet, key in sheets.items()}
+
+
+def write_output(tables, condition, excel=False):
+    """Saves a condition's tables as the Arrow result of its output, and the .xlsx itself with excel=True.
+
+    The condition is kept as the result's metadata.
+    """
+    with profiling.stage("write_output"):
+        written = save_output(condition["output"], tables, metadata={"condition": condition}, excel=excel)
+    print(f"Output written to {', '.join(os.path.basename(path) for path in written)}")
+
+
+def run_scenarios(paths, names=None, runner=None, excel=False):
+    """Runs every condition (or only those in names) of the given scenario files.
+
+    Returns a {(scenario file, condition name): result} map. A condition that
+    refers to a reaction or metabolite missing from its model (checked before
+    it runs), or to a missing input file, is reported and skipped. Outputs are saved as Arrow results, and also as
+    Excel workbooks with excel=True.
+    """
+    runner = runner or ScenarioRunner()
+    results = {}
+    for path in paths:
+        for condition in load_scenarios(path):
+            if names is not None and condition["name"] not in names:
+                continue
+            print(f"== {path}: {condition['name']}")
+            try:
+                missing = runner.missing_ids(condition)
+                if missing:
+                    print(f"Skipped: {', '.join(map(repr, missing))} not in {os.path.basename(condition['model'])}")
+                    continue
+                with profiling.stage(condition["analysis"]):
+                    result = runner.run(condition)
+            except FileNotFoundError as error:
+                print(f"Skipped: {error}")
+                continue
+            results[path, condition["name"]] = result
+
+            if condition["analysis"] == "protein_sweep":
+                feasible = np.isfinite(result["biomass"])
+                print(f"Swept {len(result['budgets'])} protein budgets, {feasible.sum()} feasible")
+                if condition.get("output"):
+                    write_output(sweep_tables(result), condition, excel)
+                continue
+
+            if condition["analysis"] == "phase_plane":
+                feasible = np.isfinite(result["biomass"])
+                print(f"Solved a {result['biomass'].shape[0]} x {result['biomass'].shape[1]} phase plane, "
+                      f"{feasible.sum()} points feasible")
+                if condition.get("output"):
+                    write_output(phase_plane_tables(result), condition, excel)
+                continue
+
+            if condition["analysis"] == "flux_sampling":
+                summary = result["summary"]
+                print(f"Drew {result['samples']} samples into {os.path.basename(result['store'])}, "
+                      f"largest R-hat {summary['rhat'].max():.4f}, "
+                      f"largest Geweke |z| {summary['geweke'].max():.2f}")
+                if condition.get("output"):
+                    tables = {"Flux Summary": summary, **result["cofactors"]}
+                    if len(result["turnover"]):
+                        tables["Cofactor Turnover"] = result["turnover"]
+                    write_output(tables, condition, excel)
+                continue
+
+            if condition["analysis"] == "fva":
+                print(f"Flux ranges of {len(result['ranges'])} reactions from {result['lps']} LPs")
+                if condition.get("output"):
+                    write_output({"Flux Ranges": result["ranges"]}, condition, excel)
+                continue
+
+            # Print the total protein cost
+            print("Total protein cost:", result["total_protein_cost"])
+            if condition.get("output"):
+                write_output(result_tables(result), condition, excel)
+            print("Biomass flux:", result["biomass_flux"])
+            if result.get("mdf") is not None:
+                mdf = result["mdf"]
+                print(f"MDF of {len(mdf['reactions'])} active reactions with a delta_G_o: {mdf['mdf']:.5f} kJ/mol, "
+                      f"bottlenecks: {', '.join(mdf['bottlenecks']) or 'none'}")
+    return results
@@ -0,0 +1,39 @@
+import numpy as np
+
+# Fluxes (or flux differences) at or below this magnitude are treated as zero
+FLUX_TOLERANCE = 1e-9
+
+
+def flux_vector(model):
+    """Returns the net fluxes of the last solve as an array in model reaction order."""
+    primals = model.solver.primal_values
+    return np.array([primals[rxn.id] - primals[rxn.reverse_id] for rxn in model.reactions])
+
+
+def set_objective(model, coefficients, direction):
+    """Rewrites the coefficients and direction of the model's current objective in place.
+
+    coefficients maps solver variables to their new coefficients; every other
+    variable gets 0. Unlike assigning a new Objective, this keeps the solver's
+    problem (and its basis) intact, so the next solve warm-starts. The change
+    is not recorded by model contexts, so only use it on an objective assigned
+    inside the current `with model:` block.
+    """
+    objective = model.objective
+    objective.set_linear_coefficients({
+        variable: coefficients.get(variable, 0.0) for variable in model.variables
+    })
+    objective.direction = direction
+
+
+def biomass_coefficients(reaction):
+    """Returns the objective coefficients that maximize a reaction's net flux."""
+    return {reaction.forward_variable: 1.0, reaction.reverse_variable: -1.0}
+
+
+def total_flux_coefficients(model):
+    """Returns the objective coefficients of the pFBA total-flux objective."""
+    return {
+        variable: 1.0
+        for rxn in model.reactions for variable in (rxn.forward_variable, rxn.reverse_variable)
+    }
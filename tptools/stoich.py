@@ -0,0 +1,36 @@
+import numpy as np
+from scipy import sparse
+
+
+def stoichiometric_matrix(model):
+    """Returns the model's stoichiometry as arrays ready for bulk loading into a solver.
+
+    Returns (S, lb, ub, reaction_ids, metabolite_ids), where S is a
+    metabolites x reactions CSR matrix and lb/ub are the reaction bounds, all
+    in model order.
+    """
+    met_index = {met.id: i for i, met in enumerate(model.metabolites)}
+    rows, cols, values = [], [], []
+    for j, rxn in enumerate(model.reactions):
+        for met, coeff in rxn.metabolites.items():
+            rows.append(met_index[met.id])
+            cols.append(j)
+            values.append(coeff)
+
+    S = sparse.csr_matrix((values, (rows, cols)), shape=(len(model.metabolites), len(model.reactions)))
+    lb = np.array([rxn.lower_bound for rxn in model.reactions], dtype=float)
+    ub = np.array([rxn.upper_bound for rxn in model.reactions], dtype=float)
+    return S, lb, ub, [rxn.id for rxn in model.reactions], list(met_index)
+
+
+def load_gurobi(m, S, lb, ub, rhs=None):
+    """Adds flux variables and the S @ v == rhs rows to a gurobipy model in two matrix calls.
+
+    Returns the flux MVar. rhs defaults to zero (steady state).
+    """
+    from gurobipy import GRB
+
+    rhs = np.zeros(S.shape[0]) if rhs is None else rhs
+    fluxes = m.addMVar(S.shape[1], lb=lb, ub=ub, name="v")
+    m.addMConstr(S, fluxes, GRB.EQUAL, rhs, name="mass_balance")
+    return fluxes
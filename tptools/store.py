@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+
+
+class ChunkStore:
+    """Directory of fixed-size, memory-mappable NumPy chunks written as results arrive.
+
+    Every chunk holds one .npy file per named array (for example simulation
+    numbers, objective values and a flux matrix). A chunk counts as complete
+    once all of its files have been renamed into place, so a run that dies
+    part-way through can be resumed by skipping the completed chunks.
+
+    The array names are fixed by the first chunk written, or up front with
+    arrays when several processes write to the same new store. inputs, a
+    JSON-serializable dict identifying what the chunks are computed from
+    (such as input file digests), is recorded with a new store; reopening
+    the store with different inputs raises ValueError, so a resumed run
+    never mixes in chunks of another.
+    """
+
+    def __init__(self, path, columns=None, chunk_size=None, arrays=None, inputs=None):
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if columns is not None and list(columns) != meta["columns"]:
+                raise ValueError(f"{path} was written for a different set of columns")
+            if chunk_size is not None and chunk_size != meta["chunk_size"]:
+                raise ValueError(f"{path} was written with chunk_size={meta['chunk_size']}")
+            if inputs is not None and inputs != meta.get("inputs"):
+                stored = meta.get("inputs") or {}
+                changed = sorted(key for key in set(inputs) | set(stored) if inputs.get(key) != stored.get(key))
+                raise ValueError(f"{path} was written from different inputs (differing in {', '.join(changed)})")
+        else:
+            if columns is None or chunk_size is None:
+                raise FileNotFoundError(f"No chunk store at {path}")
+            os.makedirs(path, exist_ok=True)
+            meta = {"columns": list(columns), "chunk_size": chunk_size, "arrays": list(arrays or [])}
+            if inputs is not None:
+                meta["inputs"] = inputs
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        self.columns = meta["columns"]
+        self.chunk_size = meta["chunk_size"]
+        self.inputs = meta.get("inputs")
+        self._arrays = meta["arrays"]
+
+    def _file(self, index, name):
+        return os.path.join(self.path, f"chunk_{index:08d}.{name}.npy")
+
+    def _save_arrays(self, names):
+        self._arrays = list(names)
+        meta = {"columns": self.columns, "chunk_size": self.chunk_size, "arrays": self._arrays}
+        if self.inputs is not None:
+            meta["inputs"] = self.inputs
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def write_chunk(self, index, **arrays):
+        """Writes one chunk; the arrays are renamed into place only after all are on disk."""
+        if not self._arrays:
+            self._save_arrays(arrays)
+        elif set(arrays) != set(self._arrays):
+            raise ValueError(f"Chunk arrays {sorted(arrays)} do not match {sorted(self._arrays)}")
+
+        for name, array in arrays.items():
+            with open(self._file(index, name) + ".tmp", "wb") as f:
+                np.save(f, np.asarray(array))
+        for name in arrays:
+            os.replace(self._file(index, name) + ".tmp", self._file(index, name))
+
+    def completed_chunks(self):
+        """Returns the sorted indices of the chunks whose arrays are all on disk."""
+        if not self._arrays:
+            return []
+        suffix = f".{self._arrays[0]}.npy"
+        indices = [int(name[6:14]) for name in os.listdir(self.path)
+                   if name.startswith("chunk_") and name.endswith(suffix)]
+        return sorted(i for i in indices if all(os.path.exists(self._file(i, name)) for name in self._arrays))
+
+    def load_chunk(self, index, name, mmap_mode="r"):
+        """Returns one array of one chunk, memory-mapped by default."""
+        return np.load(self._file(index, name), mmap_mode=mmap_mode)
+
+    def iter_chunks(self, name, mmap_mode="r"):
+        """Yields (chunk index, array) for every completed chunk in order."""
+        for index in self.completed_chunks():
+            yield index, self.load_chunk(index, name, mmap_mode)
+
+    def read(self, name):
+        """Returns the named array of all completed chunks concatenated in chunk order."""
+        parts = [array for _, array in self.iter_chunks(name)]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+
+def save_matrix(path, columns, array):
+    """Saves a 2-D array as a memory-mappable .npy file with its column labels in path + ".reactions.txt"."""
+    np.save(path, array)
+    with open(path + ".reactions.txt", "w") as f:
+        f.write("\n".join(columns) + "\n")
+
+
+def load_matrix(path, mmap_mode="r"):
+    """Returns (column labels, memory-mapped array) saved by save_matrix."""
+    with open(path + ".reactions.txt") as f:
+        columns = f.read().split()
+    return columns, np.load(path, mmap_mode=mmap_mode)
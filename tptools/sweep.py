@@ -0,0 +1,60 @@
+import numpy as np
+from optlang.symbolics import Zero
+
+from tptools.solver import biomass_coefficients, flux_vector, set_objective, total_flux_coefficients
+
+
+def protein_budget_sweep(model, constraint, biomass_reaction, budgets, fixed=False, fraction_of_optimum=1.0):
+    """Maximizes biomass and then runs pFBA for every protein budget, as one parametric LP.
+
+    constraint is the total protein cost constraint already added to the model;
+    each point sets its upper bound (and its lower bound too when fixed=True)
+    to the budget. Between points only that bound, a biomass floor and the
+    objective coefficients change, so every solve starts from the previous
+    basis. Call inside `with model:`.
+
+    Returns a dict with the "budgets", the maximum "biomass" and the pFBA
+    "fluxes" (budgets x reactions, NaN rows where the budget is infeasible) as
+    arrays, plus the "reaction_ids" of the flux columns.
+    """
+    budgets = np.asarray(budgets, dtype=float)
+    reaction = model.reactions.get_by_id(biomass_reaction)
+    growth = biomass_coefficients(reaction)
+    total_flux = total_flux_coefficients(model)
+
+    # The sweep rewrites the coefficients of its own objective, so the model's objective is restored on context exit
+    model.objective = model.problem.Objective(Zero, direction="max", sloppy=True)
+
+    # pFBA holds biomass at its optimum through this floor; it is left at the reaction's own
+    # lower bound while maximizing (some solver interfaces reject unbounded constraints)
+    open_floor = reaction.lower_bound
+    biomass_floor = model.problem.Constraint(reaction.flux_expression, lb=open_floor, name="_sweep_biomass_floor")
+    model.add_cons_vars([biomass_floor])
+
+    biomass = np.full(len(budgets), np.nan)
+    fluxes = np.full((len(budgets), len(model.reactions)), np.nan)
+    for i, budget in enumerate(budgets):
+        # Open the lower bound first so the new bounds are never crossed while they are set
+        constraint.lb = 0
+        constraint.ub = budget
+        if fixed:
+            constraint.lb = budget
+
+        biomass_floor.lb = open_floor
+        set_objective(model, growth, "max")
+        mu = model.slim_optimize(error_value=np.nan)
+        if np.isnan(mu):
+            continue
+        biomass[i] = mu
+
+        biomass_floor.lb = mu * fraction_of_optimum
+        set_objective(model, total_flux, "min")
+        if not np.isnan(model.slim_optimize(error_value=np.nan)):
+            fluxes[i] = flux_vector(model)
+
+    return {
+        "budgets": budgets,
+        "biomass": biomass,
+        "fluxes": fluxes,
+        "reaction_ids": [rxn.id for rxn in model.reactions],
+    }
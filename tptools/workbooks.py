@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from tptools.cache import atomic_write, cache_path, stamped_digest
+
+
+def load_sheet(path, sheet=0):
+    """Returns one sheet of an Excel workbook as arrays, parsing the workbook only once per version.
+
+    The first column holds the row labels (reaction ids) and the others the
+    values. The result is a dict with the "index" and "columns" label lists
+    and the float "values" matrix (NaN where a cell is empty or not a number).
+    It is cached as .npz under the workbook's digest (see
+    tptools.cache.stamped_digest), so an unchanged workbook is not even
+    re-hashed, and an edited one is parsed again.
+    """
+    snapshot = cache_path(stamped_digest(path), f"sheet-{sheet}.npz")
+    try:
+        data = np.load(snapshot)
+    except OSError:
+        df = pd.read_excel(path, sheet_name=sheet, index_col=0)
+        values = df.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        atomic_write(snapshot, lambda f: np.savez(
+            f, index=np.array(df.index, dtype=str), columns=np.array(df.columns, dtype=str), values=values,
+        ))
+        data = np.load(snapshot)
+
+    with data:
+        return {
+            "index": data["index"].tolist(),
+            "columns": data["columns"].tolist(),
+            "values": data["values"],
+        }
+
+
+def align_rows(sheet, row_ids, columns=None, fill=np.nan):
+    """Returns a (len(row_ids) x columns) matrix of a sheet's values with its rows in the order of row_ids.
+
+    columns defaults to every column of the sheet. Rows and columns the sheet
+    does not have are filled with fill; a label repeated in the sheet takes
+    its last row.
+    """
+    position = {label: i for i, label in enumerate(sheet["index"])}
+    rows = np.array([position.get(row_id, -1) for row_id in row_ids], dtype=int)
+    values = sheet["values"]
+    if columns is not None:
+        column_position = {label: j for j, label in enumerate(sheet["columns"])}
+        cols = np.array([column_position.get(column, -1) for column in columns], dtype=int)
+        values = np.where(cols >= 0, values[:, cols], fill)
+    return np.where((rows >= 0)[:, None], values[rows], fill)
+
+
+def load_protein_costs(path, reaction_ids):
+    """Returns the protein costs of a kcat/MW workbook (first sheet, first value column) in the order of reaction_ids.
+
+    Reactions without a cost get 0.
+    """
+    return align_rows(load_sheet(path), reaction_ids, fill=0.0)[:, 0]